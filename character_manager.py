@@ -0,0 +1,217 @@
+import time
+
+import numpy as np
+from panda3d.bullet import BulletGhostNode
+from panda3d.core import Vec3
+
+from kcc import ZERO, PandaBulletCharacterController
+from kcc_telemetry import UPDATE
+from player import Player
+
+# Same as ObstacleCourse's player: walkHeight, crouchHeight, stepHeight, radius
+RUNNER_SIZE = [2.0, 1.0, 0.5, 0.5]
+
+
+class CharacterManager:
+    """
+    Builds a PandaBulletCharacterController for every player object created
+    in the world and updates them all in one pass per frame.  The first
+    one is whoever the input controls, the rest are runners driven by
+    whatever sets their movement (setLinearMovement, startJump, ...).
+
+    Call update() once a frame before the world ticks, instead of calling
+    update on each controller.
+    """
+
+    def __init__(self, game_world, parent, telemetry=None):
+        """
+        parent -- the NodePath the controllers parent their nodes to
+        telemetry -- a Telemetry every controller records its events in
+        """
+        self.game_world = game_world
+        self.parent = parent
+        self.telemetry = telemetry
+        self.characters = []
+        self.by_id = {}
+
+        game_world.create_topic.subscribe(self.new_game_objects)
+        game_world.destroy_topic.subscribe(self.destroy_game_objects)
+
+    def __len__(self):
+        return len(self.characters)
+
+    def __iter__(self):
+        return iter(self.characters)
+
+    @property
+    def player(self):
+        return self.characters[0] if self.characters else None
+
+    def new_game_objects(self, game_objects):
+        for game_object in game_objects:
+            if game_object.kind == 'player' and game_object.id not in self.by_id:
+                self.add(game_object)
+
+    def destroy_game_objects(self, game_objects):
+        for game_object in game_objects:
+            character = self.by_id.pop(game_object.id, None)
+            if character:
+                self.characters.remove(character)
+                character.destroy()
+
+    def add(self, game_object):
+        character = PandaBulletCharacterController(self.game_world.physics_world, self.parent, game_object)
+        character.telemetry = self.telemetry
+        self.characters.append(character)
+        self.by_id[game_object.id] = character
+        self.game_world.register_character(character)
+        return character
+
+    def set_telemetry(self, telemetry):
+        self.telemetry = telemetry
+        for character in self.characters:
+            character.telemetry = telemetry
+
+    def spawn(self, positions, size=RUNNER_SIZE):
+        """
+        Create a runner at each position in one batch and return their
+        controllers.
+        """
+        objects = self.game_world.create_objects([(position, 'player', list(size), 1.0, Player)
+                                                  for position in positions])
+        return [self.by_id[game_object.id] for game_object in objects]
+
+    def update(self, dt):
+        characters = self.characters
+        if not characters:
+            return
+
+        # Each pass is a frame, timed as a whole as the controllers'
+        # own update isn't called
+        telemetry = self.telemetry
+        if telemetry is not None:
+            telemetry.frame += 1
+            start = time.perf_counter()
+
+        for character in characters:
+            character.beginUpdate(dt)
+
+        jumping = []
+        falling = []
+        for character in characters:
+            state = character.movementState
+            if state == 'jumping':
+                if not character.hitCeiling():
+                    jumping.append(character)
+            elif state == 'falling':
+                falling.append(character)
+            else:
+                character.processState()
+
+        if jumping:
+            self.jump_arcs(jumping)
+        if falling:
+            self.fall_arcs(falling)
+
+        penetrations = self.penetrations()
+        for character in characters:
+            character.finishUpdate(penetrations.get(character, ZERO))
+
+        if telemetry is not None:
+            telemetry.record(UPDATE, -1, 0, time.perf_counter() - start, 0.0, 0.0, 0.0)
+
+    def jump_arcs(self, characters):
+        # The jump arc, gravity * t ** 2 + speed * t + start, for all at once
+        count = len(characters)
+        arcs = np.fromiter((value for character in characters
+                            for value in (character.jumpTime + character.timeStep, character.gravity,
+                                          character.jumpSpeed, character.jumpStartPos)),
+                           dtype=np.float64, count=count * 4).reshape(count, 4)
+        t = arcs[:, 0]
+        heights = arcs[:, 1] * t * t + arcs[:, 2] * t + arcs[:, 3]
+
+        for character, jump_time, z in zip(characters, t.tolist(), heights.tolist()):
+            character.jumpTo(jump_time, z)
+
+    def fall_arcs(self, characters):
+        count = len(characters)
+        arcs = np.fromiter((value for character in characters
+                            for value in (character.fallTime + character.timeStep, character.gravity)),
+                           dtype=np.float64, count=count * 2).reshape(count, 2)
+        t = arcs[:, 0]
+        deltas = arcs[:, 1] * t * t
+
+        for character, fall_time, delta in zip(characters, t.tolist(), deltas.tolist()):
+            character.fallTo(fall_time, delta)
+
+    def penetrations(self):
+        """
+        How far each character has to be pushed out of what it's inside of,
+        from a single walk over the world's contact manifolds instead of a
+        contact test per character.  The ghost riding on each capsule keeps
+        manifolds against everything the capsule touches.
+        """
+        pushes = {}
+        for manifold in self.game_world.physics_world.getManifolds():
+            if not manifold.getNumManifoldPoints():
+                continue
+
+            node0 = manifold.getNode0()
+            node1 = manifold.getNode1()
+
+            # The character's ghost may be on either side, flip the normal if it's B
+            character = node0.getPythonTag("character")
+            if character is not None:
+                other = node1
+                sign = 1.0
+            else:
+                character = node1.getPythonTag("character")
+                if character is None:
+                    continue
+                other = node0
+                sign = -1.0
+
+            # Same as the contact test, other ghosts and our own capsule don't push
+            if type(other) is BulletGhostNode or other.getPythonTag("owner") is character.game_object:
+                continue
+
+            push = pushes.get(character)
+            if push is None:
+                push = pushes[character] = Vec3()
+
+            for point in manifold.getManifoldPoints():
+                distance = point.getDistance()
+                if distance < 0:
+                    push -= (point.getPositionWorldOnB() - point.getPositionWorldOnA()) * (distance * sign)
+
+        return pushes
+
+
+if __name__ == '__main__':
+    import sys
+
+    from game_object import GameObject
+    from headless import HeadlessGame
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    # A field big enough for a grid of runners a couple of metres apart
+    game = HeadlessGame()
+    side = int(np.ceil(np.sqrt(count)))
+    game.game_world.create_object((-100 - side, 0, -0.5), "floor", [200.0, side * 2.0 + 4.0, 1.0], 0, GameObject)
+
+    runners = game.characters.spawn([(-10.0 - (i // side) * 2.0, (i % side - side / 2) * 2.0, 0.5)
+                                     for i in range(count)])
+    for i, runner in enumerate(runners):
+        runner.setH(90.0)
+        runner.setLinearMovement(Vec3(0, 5, 0))
+        if i % 3 == 0:
+            runner.startJump(2)
+
+    frames = 600
+    start = time.perf_counter()
+    for _ in range(frames):
+        game.step()
+    elapsed = time.perf_counter() - start
+
+    print(f"Stepped {len(game.characters)} characters {frames} times at {frames / elapsed:.0f} frames per second")
@@ -0,0 +1,81 @@
+from static_baking import owner_of
+
+
+class CollisionDispatcher:
+    """
+    Reports collisions between game objects by walking Bullet's persistent
+    manifolds once per physics step, instead of running a contact test for
+    every collision source.
+
+    Each touching pair of objects is reported once per step, no matter which
+    side (or both) is a collision source.  Both objects get collision_enter
+    on the first step they touch, collision_stay on every following step, and
+    collision_exit on the first step they no longer touch.
+
+    sources is kept up to date by the game world and maps the id of every
+    collision source to its object.  With none around there's nothing to do.
+    """
+
+    def __init__(self, physics_world, sources):
+        self.physics_world = physics_world
+        self.sources = sources
+
+        # (lower id, higher id) -> (game object, game object)
+        self.contacts = {}
+
+    def dispatch(self):
+        sources = self.sources
+        if not sources and not self.contacts:
+            return
+
+        current = {}
+
+        for manifold in self.physics_world.getManifolds():
+            if not manifold.getNumManifoldPoints():
+                continue
+
+            node0 = manifold.getNode0()
+            node1 = manifold.getNode1()
+            a = node0.getPythonTag("owner")
+            b = node1.getPythonTag("owner")
+
+            # Baked static regions hold many objects, the manifold point
+            # says which child shape is touching
+            if a is None:
+                a = owner_of(node0, manifold.getManifoldPoint(0).getIndex0())
+            if b is None:
+                b = owner_of(node1, manifold.getManifoldPoint(0).getIndex1())
+
+            if a is None or b is None or a is b:
+                continue
+
+            if a.id not in sources and b.id not in sources:
+                continue
+
+            if a.id < b.id:
+                current[(a.id, b.id)] = (a, b)
+            else:
+                current[(b.id, a.id)] = (b, a)
+
+        previous = self.contacts
+        self.contacts = current
+
+        for key, (a, b) in current.items():
+            if key in previous:
+                a.collision_stay(b)
+                b.collision_stay(a)
+            else:
+                a.collision_enter(b)
+                b.collision_enter(a)
+
+        for key, (a, b) in previous.items():
+            if key not in current:
+                a.collision_exit(b)
+                b.collision_exit(a)
+
+    def forget(self, game_object):
+        # Drop pairs for an object that's going away, without notifying anyone
+        self.contacts = {key: pair for key, pair in self.contacts.items() if game_object.id not in key}
+
+    def clear(self):
+        self.contacts = {}
@@ -0,0 +1,246 @@
+import random
+
+from course_validator import Box, CharacterLimits, CourseValidator
+from game_object import GameObject
+from level_cache import LevelRecorder
+from obstacle_course import ObstacleCourse
+from player import Player
+
+# The size of the generated player: walkHeight, crouchHeight, stepHeight, radius
+PLAYER_SIZE = [2.0, 1.0, 0.5, 0.5]
+LIMITS = CharacterLimits.from_size(PLAYER_SIZE)
+
+# ObstacleCourse's ceilings are given by the height of their middle, they're
+# 0.5 thick over a platform whose top is at 0.5
+PLATFORM_TOP = 0.5
+CEILING_HALF = 0.25
+
+# Room left over the crouching capsule under the lowest ceiling
+CROUCH_MARGIN = 0.1
+
+# How many times an obstacle the player can't get past is drawn again
+MAX_DRAWS = 20
+
+
+def ceiling_height(clearance):
+    # Where a ceiling goes to leave clearance over a platform, never so low
+    # the player can't crouch under it
+    clearance = max(clearance, LIMITS.crouch_top + CROUCH_MARGIN)
+    return PLATFORM_TOP + clearance + CEILING_HALF
+
+
+# Each obstacle is built at x by one of ObstacleCourse's builders, with its
+# settings scaled by difficulty (0 easy to 1 hard).  Returns how far along
+# x the obstacle reaches, so the next one can start after it.
+
+def gap(course, x, rng, difficulty):
+    width = 1.0 + 3.0 * difficulty * rng.random()
+    course.create_gap(x + 3.5, 0, width, rng.choice((0, 1)))
+    return width + 7.0
+
+
+def low_ceiling(course, x, rng, difficulty):
+    length = rng.uniform(2.0, 5.0)
+    course.create_low_ceiling(x, 0, length, ceiling_height(1.8 - 0.6 * difficulty * rng.random()))
+    return length
+
+
+def barrier(course, x, rng, difficulty):
+    course.create_barrier(x + 3.5, 0, 0.5 + 1.5 * difficulty * rng.random(), rng.uniform(0.5, 1.0))
+    return 7.0
+
+
+def crouch_tunnel(course, x, rng, difficulty):
+    length = rng.uniform(5.0, 8.0)
+    # The middle of the tunnel is 0.2 lower than its ends
+    course.create_crouch_tunnel(x, 0, length, ceiling_height(1.6 - 0.4 * difficulty * rng.random()) + 0.2)
+    return length
+
+
+def stair_blocks(course, x, rng, difficulty):
+    course.create_stair_blocks(x + 1.0, 0)
+    return 12.0
+
+
+# ObstacleCourse's own low_high_combo, variable_tunnel and final_challenge
+# put their ceilings too low to crouch under, so they're built here from
+# the same pieces with ceiling_height
+
+def low_high_combo(course, x, rng, difficulty):
+    course.create_low_ceiling(x, 0, 3, ceiling_height(0.0))
+    course.create_gap(x + 5, 0, 2, 0)
+    return 10.5
+
+
+def zigzag_platforms(course, x, rng, difficulty):
+    course.create_zigzag_platforms(x + 1.5, 0)
+    return 15.0
+
+
+def variable_tunnel(course, x, rng, difficulty):
+    length = rng.uniform(6.0, 10.0)
+    course.game_world.create_object((x + length / 2, 0, 0), "floor", [length, 5.0, 1.0], 0, GameObject)
+
+    # The lowest section just lets a crouching player through
+    raised = [0.4, 0.2, 0.3, 0.1, 0.4, 0.2, 0.0, 0.3]
+    width = length / len(raised)
+    for i, height in enumerate(raised):
+        course.game_world.create_object((x + i * width + width / 2, 0, ceiling_height(0.0) + height), "floor",
+                                        [width, 5.0, 0.5], 0, GameObject)
+    return length
+
+
+def teleporter_trap(course, x, rng, difficulty):
+    course.create_teleporter_trap(x, 0)
+    return 8.0
+
+
+def final_challenge(course, x, rng, difficulty):
+    # A shorter ceiling than ObstacleCourse's, to leave room to stand up
+    # and jump the gap
+    course.create_low_ceiling(x, 0, 1.5, ceiling_height(0.0))
+    course.create_gap(x + 3, 0, 1.5, 0)
+    course.game_world.create_object((x + 6, 0, 0.6), "red box", [0.5, 5.0, 1.2], 0, GameObject)
+    course.game_world.create_object((x + 8, 0, 0), "floor", [3.0, 5.0, 1.0], 0, GameObject)
+    return 9.5
+
+
+OBSTACLES = {
+    'gap': gap,
+    'low_ceiling': low_ceiling,
+    'barrier': barrier,
+    'crouch_tunnel': crouch_tunnel,
+    'stair_blocks': stair_blocks,
+    'low_high_combo': low_high_combo,
+    'zigzag_platforms': zigzag_platforms,
+    'variable_tunnel': variable_tunnel,
+    'teleporter_trap': teleporter_trap,
+    'final_challenge': final_challenge,
+}
+
+
+class CourseSpec:
+    """
+    What kind of course to generate.
+
+    obstacles -- how many obstacles to place
+    difficulty -- 0 to 1, scales gaps, barrier heights and ceiling heights
+    mix -- relative weight of each obstacle in OBSTACLES, all equal if not given
+    """
+
+    def __init__(self, obstacles=12, difficulty=0.5, mix=None):
+        self.obstacles = obstacles
+        self.difficulty = difficulty
+        self.mix = dict(mix) if mix else dict.fromkeys(OBSTACLES, 1.0)
+
+
+def crossable(level, first, start, end):
+    """
+    Whether the player can get from start, over everything created since
+    the first index, onto a floor laid after end.  Only the newest part of
+    the course is checked, so it takes the same time however long it gets.
+    """
+    boxes = [Box(index, level.kinds[index], level.positions[index], level.sizes[index],
+                 level.collision_sources[index])
+             for index in range(first, len(level))
+             if level.masses[index] == 0 and len(level.sizes[index]) >= 3]
+    boxes.append(Box(len(level), "floor", (end + 1.0, 0, -0.5), [2.0, 5.0, 1.0], False))
+
+    validator = CourseValidator(boxes, LIMITS, start, end + 0.5, ObstacleCourse.fall_z)
+    return validator.validate().completable
+
+
+def generate_level(seed, spec=None):
+    """
+    Build a course from a seed and a spec.  The same seed and spec always
+    give the same course.  Returns the Level and the x position past which
+    the course is complete.
+
+    Every obstacle is checked with the CourseValidator as it's placed, from
+    the plain floor in front of it to the next, and drawn again if the
+    player couldn't get past it.  ValueError is raised if none of MAX_DRAWS
+    draws can be passed.
+    """
+    spec = spec or CourseSpec()
+    rng = random.Random(seed)
+
+    recorder = LevelRecorder()
+    course = ObstacleCourse(recorder)
+
+    # Starting platform and the player on it, as in ObstacleCourse.build
+    recorder.create_object((0, 0, 0), "floor", [5.0, 5.0, 1.0], 0, GameObject)
+    recorder.create_object((0, 0, 2), "player", PLAYER_SIZE, 1.0, Player)
+
+    names = list(spec.mix)
+    weights = [spec.mix[name] for name in names]
+
+    x = 2.5
+    for _ in range(spec.obstacles):
+        # Plain floor between obstacles, shorter on harder courses
+        length = 2.0 + 2.0 * (1.0 - spec.difficulty) * rng.random()
+        floor = len(recorder.level)
+        recorder.create_object((x + length / 2, 0, -0.5), "floor", [length, 5.0, 1.0], 0, GameObject)
+        start = (x + length / 2, 0, 0)
+        x += length
+
+        placed = len(recorder.level)
+        for _ in range(MAX_DRAWS):
+            name, = rng.choices(names, weights)
+            end = x + OBSTACLES[name](course, x, rng, spec.difficulty)
+            if crossable(recorder.level, floor, start, end):
+                break
+            recorder.truncate(placed)
+        else:
+            raise ValueError(f"no obstacle the player can get past at x {x:g} after {MAX_DRAWS} draws")
+
+        x = end
+
+    recorder.create_object((x + 1.5, 0, -0.5), "floor", [3.0, 5.0, 1.0], 0, GameObject)
+    recorder.create_object((x + 5.5, 0, 1.5), "crate", [5.0, 5.0, 3.0], 0, GameObject)
+
+    return recorder.level, x + 0.5
+
+
+class GeneratedCourse(ObstacleCourse):
+    """
+    A generated course that can stand in for ObstacleCourse.  Everything is
+    created through GameWorld.create_level in one go, with the static boxes
+    baked into regions of region_size (None to leave them as they are).
+    """
+
+    def __init__(self, game_world, seed=0, spec=None, region_size=32.0):
+        super().__init__(game_world)
+        self.seed = seed
+        self.spec = spec
+        self.region_size = region_size
+        self.level = None
+
+    def build(self):
+        self.level, self.goal_x = generate_level(self.seed, self.spec)
+        objects = self.game_world.create_level(self.level, self.region_size)
+
+        self.start = objects[0]
+        self.player_obj = objects[1]
+        self.goal = objects[-1]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from course_validator import validator_for_level
+    from level_cache import save_level
+
+    parser = argparse.ArgumentParser(description="Generate an obstacle course level file")
+    parser.add_argument('filename')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--obstacles', type=int, default=12)
+    parser.add_argument('--difficulty', type=float, default=0.5)
+    parser.add_argument('--validate', action='store_true', help="check the course can be finished")
+    args = parser.parse_args()
+
+    level, goal_x = generate_level(args.seed, CourseSpec(args.obstacles, args.difficulty))
+    save_level(level, args.filename)
+    print(f"Wrote {len(level)} objects to {args.filename}, the goal is past x {goal_x:g}")
+
+    if args.validate:
+        print(validator_for_level(level, args.filename, goal_x=goal_x).validate())
@@ -0,0 +1,495 @@
+import math
+import multiprocessing
+from collections import deque
+
+from level_cache import LevelRecorder, load_level
+
+# How a piece of floor can be crossed
+CROUCH = 1
+WALK = 2
+
+# Spacing of the points checked along a jump or fall for anything in the way
+ARC_SPACING = 0.25
+
+EPSILON = 1e-6
+
+
+def capsule_layout(full_height, step_height, radius):
+    # Same as setData in the kcc's __setup, returns the capsule's cylinder
+    # length, levitation and radius
+    if full_height - step_height <= radius * 2.0:
+        length = 0.1
+        radius = (full_height * 0.5) - (step_height * 0.5)
+        levitation = step_height + radius
+    else:
+        length = full_height - step_height - radius * 2.0
+        levitation = full_height - radius - length / 2.0
+
+    return length, levitation, radius
+
+
+class CharacterLimits:
+    """
+    How far the kcc can step, jump and fall, worked out from the player's
+    size the same way the kcc sizes its capsules.  jump_height and speed
+    match what PlayerControls.move_player asks of the kcc.
+
+    Heights are measured from the character's feet.  The capsule floats
+    above the feet, so anything lower than its bottom is stepped onto and
+    anything that reaches into it blocks the way.
+    """
+
+    def __init__(self, walk_height, crouch_height, step_height, radius, jump_height=2.0, speed=5.0, gravity=-9.81):
+        self.walk_height = walk_height
+        self.crouch_height = crouch_height
+        self.radius = radius
+        self.jump_height = jump_height
+        self.speed = speed
+
+        # The kcc moves by gravity * t ** 2 when jumping or falling
+        self.gravity = abs(gravity)
+
+        length, levitation, capsule_radius = capsule_layout(walk_height, step_height, radius)
+        self.walk_bottom = levitation - capsule_radius
+        self.walk_top = levitation + length + capsule_radius
+
+        length, levitation, capsule_radius = capsule_layout(crouch_height, step_height, radius)
+        self.crouch_bottom = levitation - capsule_radius
+        self.crouch_top = levitation + length + capsule_radius
+
+    @classmethod
+    def from_size(cls, size, **kwargs):
+        # A player's size is walk height, crouch height, step height, radius
+        return cls(size[0], size[1], size[2], size[3], **kwargs)
+
+    def capsule(self, mode):
+        if mode == WALK:
+            return self.walk_bottom, self.walk_top
+
+        return self.crouch_bottom, self.crouch_top
+
+    def step(self, mode):
+        return self.capsule(mode)[0]
+
+    def rise(self, ceiling, mode):
+        """
+        How high a jump goes with a ceiling this far above the feet, after
+        the kcc's active jump limiter.  Negative means the jump can't start.
+        """
+        height = self.walk_height if mode == WALK else self.crouch_height
+        if ceiling < self.jump_height + height:
+            return ceiling - height * 1.2
+
+        return self.jump_height
+
+    def height_at(self, t, rise, drop):
+        """
+        Height above the take off point t seconds into a jump that rises by
+        rise and then drops by drop.
+        """
+        t_up = math.sqrt(rise / self.gravity)
+        if t <= t_up:
+            return 2.0 * math.sqrt(self.gravity * rise) * t - self.gravity * t * t
+
+        return max(rise - self.gravity * (t - t_up) ** 2, rise - drop)
+
+    def reach(self, rise, drop):
+        """
+        How far the character travels before landing drop below the top of
+        a jump that rises by rise.
+        """
+        return self.speed * (math.sqrt(rise / self.gravity) + math.sqrt(max(drop, 0.0) / self.gravity))
+
+
+class Box:
+    __slots__ = ('index', 'kind', 'x0', 'y0', 'z0', 'x1', 'y1', 'z1', 'hazard')
+
+    def __init__(self, index, kind, position, size, hazard):
+        self.index = index
+        self.kind = kind
+        self.x0, self.x1 = position[0] - size[0] / 2, position[0] + size[0] / 2
+        self.y0, self.y1 = position[1] - size[1] / 2, position[1] + size[1] / 2
+        self.z0, self.z1 = position[2] - size[2] / 2, position[2] + size[2] / 2
+        self.hazard = hazard
+
+
+class Piece:
+    """
+    A rectangle of some box's top surface that's all crossed the same way,
+    with the lowest ceiling over it.
+    """
+
+    __slots__ = ('box', 'z', 'x0', 'y0', 'x1', 'y1', 'mode', 'ceiling')
+
+    def __init__(self, box, z, x0, y0, x1, y1, mode, ceiling):
+        self.box = box
+        self.z = z
+        self.x0, self.y0, self.x1, self.y1 = x0, y0, x1, y1
+        self.mode = mode
+        self.ceiling = ceiling
+
+    def __repr__(self):
+        return (f"<{self.box.kind} {self.box.index} at z {self.z:g}, "
+                f"x {self.x0:g}..{self.x1:g} y {self.y0:g}..{self.y1:g}>")
+
+    def contains(self, x, y):
+        return self.x0 <= x <= self.x1 and self.y0 <= y <= self.y1
+
+    def gap(self, other):
+        dx = max(other.x0 - self.x1, self.x0 - other.x1, 0.0)
+        dy = max(other.y0 - self.y1, self.y0 - other.y1, 0.0)
+        return math.hypot(dx, dy)
+
+    def closest(self, x, y):
+        return min(max(x, self.x0), self.x1), min(max(y, self.y0), self.y1)
+
+
+def split(piece, x0, y0, x1, y1):
+    """
+    Cut a rectangle out of a piece.  Returns the pieces left outside it and
+    the piece inside it, or None if they don't overlap.
+    """
+    ix0, iy0 = max(piece.x0, x0), max(piece.y0, y0)
+    ix1, iy1 = min(piece.x1, x1), min(piece.y1, y1)
+    if ix0 >= ix1 - EPSILON or iy0 >= iy1 - EPSILON:
+        return [piece], None
+
+    def cut(px0, py0, px1, py1):
+        return Piece(piece.box, piece.z, px0, py0, px1, py1, piece.mode, piece.ceiling)
+
+    outside = []
+    if piece.x0 < ix0 - EPSILON:
+        outside.append(cut(piece.x0, piece.y0, ix0, piece.y1))
+    if ix1 < piece.x1 - EPSILON:
+        outside.append(cut(ix1, piece.y0, piece.x1, piece.y1))
+    if piece.y0 < iy0 - EPSILON:
+        outside.append(cut(ix0, piece.y0, ix1, iy0))
+    if iy1 < piece.y1 - EPSILON:
+        outside.append(cut(ix0, iy1, ix1, piece.y1))
+
+    return outside, cut(ix0, iy0, ix1, iy1)
+
+
+class CourseReport:
+    """
+    The result of validating a course.  path is the list of (move, piece)
+    steps from the start to the goal, with move one of 'start', 'walk',
+    'crouch', 'jump' or 'fall', and is None if the goal can't be reached.
+    unreachable lists the pieces of floor the player can never get to.
+    """
+
+    def __init__(self, name, pieces, reached, path, unreachable):
+        self.name = name
+        self.pieces = pieces
+        self.reached = reached
+        self.path = path
+        self.unreachable = unreachable
+
+    @property
+    def completable(self):
+        return self.path is not None
+
+    def __str__(self):
+        lines = [f"{self.name}: {'completable' if self.completable else 'NOT completable'}, "
+                 f"{len(self.reached)} of {len(self.pieces)} pieces reachable"]
+        if self.path is None:
+            lines.append("  unreachable:")
+            lines.extend(f"    {piece}" for piece in self.unreachable)
+
+        return "\n".join(lines)
+
+
+class CourseValidator:
+    """
+    Works out whether a course can be finished without running any physics.
+
+    The top of every static box is cut into pieces by whatever is over it,
+    then pieces are joined where the player can walk, crouch, jump or fall
+    from one to the other.  The course can be finished if the graph leads
+    from the start to a piece past goal_x.  Collision sources count as
+    hazards to be avoided, and boxes with mass are ignored since they
+    won't stay where they start.
+    """
+
+    # Boxes are bucketed by position in cells this size for arc checks
+    cell_size = 2.0
+
+    def __init__(self, boxes, limits, start, goal_x, fall_z, name="course"):
+        self.boxes = boxes
+        self.limits = limits
+        self.start = start
+        self.goal_x = goal_x
+        self.fall_z = fall_z
+        self.name = name
+
+        self.cells = {}
+        for box in boxes:
+            for cell in self.cells_over(box.x0 - limits.radius, box.y0 - limits.radius,
+                                        box.x1 + limits.radius, box.y1 + limits.radius):
+                self.cells.setdefault(cell, []).append(box)
+
+    def cells_over(self, x0, y0, x1, y1):
+        size = self.cell_size
+        for i in range(math.floor(x0 / size), math.floor(x1 / size) + 1):
+            for j in range(math.floor(y0 / size), math.floor(y1 / size) + 1):
+                yield i, j
+
+    def pieces_of(self, box):
+        limits = self.limits
+        radius = limits.radius
+        z = box.z1
+
+        # Anything over this high can't even limit a jump
+        reach_up = limits.jump_height + limits.walk_height * 1.2
+
+        pieces = [Piece(box, z, box.x0, box.y0, box.x1, box.y1, WALK, math.inf)]
+        candidates = set()
+        for cell in self.cells_over(box.x0, box.y0, box.x1, box.y1):
+            candidates.update(self.cells.get(cell, ()))
+
+        for other in sorted(candidates, key=lambda other: other.index):
+            if other is box or other.z1 <= z + EPSILON or other.z0 >= z + reach_up:
+                continue
+
+            bottom = other.z0 - z
+            top = other.z1 - z
+
+            if other.hazard:
+                mode, inflate = 0, radius
+            elif top <= min(limits.walk_bottom, limits.crouch_bottom):
+                # Low enough to step onto, so over its footprint the
+                # player is on top of it instead
+                mode, inflate = 0, 0.0
+            elif bottom >= limits.walk_top or top <= limits.walk_bottom:
+                mode, inflate = WALK, radius
+            elif bottom >= limits.crouch_top or top <= limits.crouch_bottom:
+                mode, inflate = CROUCH, radius
+            else:
+                mode, inflate = 0, radius
+
+            x0, y0 = other.x0 - inflate, other.y0 - inflate
+            x1, y1 = other.x1 + inflate, other.y1 + inflate
+
+            remaining = []
+            for piece in pieces:
+                outside, inside = split(piece, x0, y0, x1, y1)
+                remaining.extend(outside)
+                if inside is None:
+                    continue
+
+                inside.mode = min(inside.mode, mode)
+                if bottom > 0:
+                    inside.ceiling = min(inside.ceiling, bottom)
+                if inside.mode:
+                    remaining.append(inside)
+
+            pieces = remaining
+
+        return pieces
+
+    def arc_is_clear(self, start, end, piece, rise, drop, mode):
+        """
+        Check the capsule's path from start to end on a jump off piece.
+        Boxes the feet pass over are fine, boxes the capsule would hit aren't.
+        """
+        limits = self.limits
+        bottom, top = limits.capsule(mode)
+        radius = limits.radius
+
+        distance = math.hypot(end[0] - start[0], end[1] - start[1])
+        samples = max(int(math.ceil(distance / ARC_SPACING)), 1)
+        for i in range(samples + 1):
+            along = i / samples
+            x = start[0] + (end[0] - start[0]) * along
+            y = start[1] + (end[1] - start[1]) * along
+            z = piece.z + limits.height_at(distance * along / limits.speed, rise, drop)
+
+            for box in self.cells.get((math.floor(x / self.cell_size), math.floor(y / self.cell_size)), ()):
+                if (box.x0 - radius < x < box.x1 + radius and box.y0 - radius < y < box.y1 + radius
+                        and box.z0 < z + top and box.z1 > z + bottom + EPSILON):
+                    return False
+
+        return True
+
+    def air_move(self, piece, other, gap):
+        """
+        'jump' or 'fall' if the player can get from piece to other through
+        the air, otherwise None.
+        """
+        limits = self.limits
+        drop = piece.z - other.z
+
+        start = piece.closest((other.x0 + other.x1) / 2, (other.y0 + other.y1) / 2)
+        end = other.closest(*start)
+
+        for mode in (WALK, CROUCH):
+            if mode > piece.mode:
+                continue
+
+            rise = limits.rise(piece.ceiling, mode)
+            if rise > EPSILON and rise + drop >= 0 and limits.reach(rise, rise + drop) >= gap:
+                if self.arc_is_clear(start, end, piece, rise, rise + drop, mode):
+                    return 'jump'
+
+        # Walking off the edge, only ever downwards
+        if drop > EPSILON and limits.reach(0.0, drop) + limits.radius >= gap:
+            if self.arc_is_clear(start, end, piece, 0.0, drop, min(piece.mode, WALK)):
+                return 'fall'
+
+        return None
+
+    def move(self, piece, other):
+        limits = self.limits
+        gap = piece.gap(other)
+
+        # Next to each other, step up or drop down
+        if gap <= limits.radius + EPSILON:
+            climb = other.z - piece.z
+            if climb <= limits.step(other.mode) + EPSILON:
+                return 'walk' if other.mode == WALK else 'crouch'
+
+        max_drop = piece.z - self.fall_z
+        if gap > limits.reach(limits.jump_height, limits.jump_height + max_drop) + limits.radius:
+            return None
+
+        return self.air_move(piece, other, gap)
+
+    def start_piece(self, pieces):
+        x, y, z = self.start
+        below = [piece for piece in pieces if piece.contains(x, y) and piece.z <= z + EPSILON]
+        if not below:
+            return None
+
+        return max(below, key=lambda piece: piece.z)
+
+    def validate(self):
+        pieces = []
+        for box in self.boxes:
+            if not box.hazard and box.z1 > self.fall_z:
+                pieces.extend(self.pieces_of(box))
+
+        start = self.start_piece(pieces)
+        if start is None:
+            return CourseReport(self.name, pieces, set(), None, pieces)
+
+        # Pieces by cell too, so only those within a jump of a piece are
+        # tried as moves from it.  Indices keep them in the order of pieces.
+        piece_cells = {}
+        for index, piece in enumerate(pieces):
+            for cell in self.cells_over(piece.x0, piece.y0, piece.x1, piece.y1):
+                piece_cells.setdefault(cell, []).append(index)
+
+        limits = self.limits
+        jump = limits.jump_height
+
+        # Breadth first from the start, working out moves as they're needed
+        parents = {id(start): (None, 'start')}
+        queue = deque([start])
+        goal = None
+        while queue:
+            piece = queue.popleft()
+            if piece.x1 > self.goal_x:
+                goal = piece
+                break
+
+            # Same limit as move, nothing further away can be reached
+            reach = limits.reach(jump, jump + piece.z - self.fall_z) + limits.radius + EPSILON
+            nearby = set()
+            for cell in self.cells_over(piece.x0 - reach, piece.y0 - reach, piece.x1 + reach, piece.y1 + reach):
+                nearby.update(piece_cells.get(cell, ()))
+
+            for index in sorted(nearby):
+                other = pieces[index]
+                if id(other) in parents:
+                    continue
+
+                move = self.move(piece, other)
+                if move:
+                    parents[id(other)] = (piece, move)
+                    queue.append(other)
+
+        path = None
+        if goal:
+            path = []
+            piece = goal
+            while piece:
+                parent, move = parents[id(piece)]
+                path.append((move, piece))
+                piece = parent
+            path.reverse()
+
+        reached = {id(piece) for piece in pieces if id(piece) in parents}
+        unreachable = [piece for piece in pieces if id(piece) not in reached]
+        return CourseReport(self.name, pieces, reached, path, unreachable)
+
+
+def validator_for_level(level, name="course", goal_x=None, fall_z=None):
+    # Imported here so validating level files doesn't need the course
+    from obstacle_course import ObstacleCourse
+
+    boxes = []
+    limits = None
+    start = None
+    for index, (position, kind, size, mass, collision_source) in enumerate(
+            zip(level.positions, level.kinds, level.sizes, level.masses, level.collision_sources)):
+        if kind == 'player':
+            limits = CharacterLimits.from_size(size)
+            start = position
+        elif mass == 0 and len(size) >= 3:
+            boxes.append(Box(index, kind, position, size, collision_source))
+
+    if limits is None:
+        raise ValueError(f"{name} has no player")
+
+    return CourseValidator(boxes, limits, start,
+                           ObstacleCourse.goal_x if goal_x is None else goal_x,
+                           ObstacleCourse.fall_z if fall_z is None else fall_z,
+                           name)
+
+
+def validate_level(filename):
+    level = load_level(filename)
+    if level is None:
+        raise ValueError(f"{filename} has no objects")
+
+    return validator_for_level(level, filename).validate()
+
+
+def validate_course(course_class=None):
+    """
+    Validate a course built in code, the default obstacle course if no
+    class is given.
+    """
+    if course_class is None:
+        from obstacle_course import ObstacleCourse
+        course_class = ObstacleCourse
+
+    recorder = LevelRecorder()
+    course_class(recorder).build()
+    return validator_for_level(recorder.level, course_class.__name__).validate()
+
+
+def validate_levels(filenames, processes=None):
+    """
+    Validate many level files at once, one per worker process.  Returns the
+    reports in the same order as filenames.
+    """
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(validate_level, filenames)
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) > 1:
+        reports = validate_levels(sys.argv[1:])
+    else:
+        reports = [validate_course()]
+
+    for report in reports:
+        print(report)
+        if report.path:
+            for move, piece in report.path:
+                print(f"  {move:6} {piece}")
+
+    sys.exit(0 if all(report.completable for report in reports) else 1)
@@ -0,0 +1,41 @@
+class Topic:
+    """
+    A named event that handlers can subscribe to.  Keep a reference to the
+    topic and call send() on it directly, that way sending an event is just
+    a loop over the handlers.
+    """
+
+    __slots__ = ('name', 'handlers')
+
+    def __init__(self, name):
+        self.name = name
+        self.handlers = ()
+
+    def subscribe(self, handler):
+        if handler not in self.handlers:
+            self.handlers = self.handlers + (handler,)
+
+    def unsubscribe(self, handler):
+        self.handlers = tuple(h for h in self.handlers if h != handler)
+
+    def send(self, *args):
+        # The handlers tuple is replaced rather than changed on (un)subscribe,
+        # so handlers can safely subscribe or unsubscribe while we loop
+        for handler in self.handlers:
+            handler(*args)
+
+
+class EventBus:
+    """
+    Hands out topics by name, creating them the first time they're asked for.
+    """
+
+    def __init__(self):
+        self.topics = {}
+
+    def topic(self, name):
+        topic = self.topics.get(name)
+        if topic is None:
+            topic = self.topics[name] = Topic(name)
+
+        return topic
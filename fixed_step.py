@@ -0,0 +1,33 @@
+class FixedStepClock:
+    """
+    Accumulates variable frame times and hands them out as a whole number of
+    fixed size simulation steps.
+    """
+
+    def __init__(self, step_size=1.0 / 60.0, max_steps=5):
+        self.step_size = step_size
+
+        # Upper bound on steps per advance() so a long stall doesn't make us
+        # spend even longer catching up
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+
+    def advance(self, elapsed):
+        self.accumulator += elapsed
+
+        steps = int(self.accumulator / self.step_size)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            self.accumulator %= self.step_size
+        else:
+            self.accumulator -= steps * self.step_size
+
+        return steps
+
+    @property
+    def alpha(self):
+        # How far we are between the last simulation step and the next one
+        return self.accumulator / self.step_size
+
+    def reset(self):
+        self.accumulator = 0.0
@@ -1,8 +1,30 @@
-from panda3d.core import TransformState, VBase3
+from panda3d.core import TransformState, VBase3, Vec3
+import math
 
 
 class GameObject:
+    __slots__ = ('world', 'store', 'slot', '_physics', '_position', '_kind', '_id', '_size',
+                 '_x_rotation', '_y_rotation', '_z_rotation', 'is_selected', '_is_collision_source')
+
+    # Whether destroyed objects of this class can be parked and reused
+    poolable = True
+
+    # Subclasses that want input define input_event(events), the game
+    # world subscribes it to the input topic
+    input_event = None
+
+    # Whether the game world calls tick every frame.  None means only if
+    # the class overrides tick, set True or False to decide explicitly.
+    ticks = None
+
     def __init__(self, position, kind, id, size, physics):
+        # Set by the game world while the object is in it
+        self.world = None
+
+        # Set while the world keeps this object's transform in a TransformStore
+        self.store = None
+        self.slot = -1
+
         # Needed to initialize self._physics for the if check in the setter
         self.physics = physics
         self.position = position
@@ -23,6 +45,23 @@ class GameObject:
         if self.physics:
             self.physics.setPythonTag("owner", None)
 
+    def revived(self, position):
+        # Called when the object pool hands a parked object out again,
+        # this should leave it as if it had just been constructed
+        self.x_rotation = 0
+        self.y_rotation = 0
+        self.z_rotation = 0
+        self.is_selected = False
+        self.is_collision_source = False
+
+        if self.physics:
+            self.physics.setPythonTag("owner", self)
+            self.physics.setLinearVelocity(Vec3(0, 0, 0))
+            self.physics.setAngularVelocity(Vec3(0, 0, 0))
+            self.physics.clearForces()
+
+        self.position = position
+
     @property
     def physics(self):
         return self._physics
@@ -39,6 +78,9 @@ class GameObject:
     def size(self, value):
         self._size = value
 
+        if self.store is not None:
+            self.store.set_size(self.slot, value)
+
     @property
     def kind(self):
         return self._kind
@@ -57,8 +99,10 @@ class GameObject:
 
     @property
     def position(self):
-        if self.physics:
-            return self.physics.getTransform().getPos()
+        # Bodies Bullet moves are copied in by the world after each step
+        # (see GameWorld.sync_transforms), so this never asks the physics
+        if self.store is not None:
+            return self.store.position(self.slot)
 
         return self._position
 
@@ -67,37 +111,105 @@ class GameObject:
         if self.physics:
             self.physics.setTransform(TransformState.makePos(VBase3(value[0], value[1], value[2])))
 
-        self._position = value
+        self.sync_position(value)
+
+    def sync_position(self, value):
+        # Update the cached position without touching the physics
+        if self.store is not None:
+            self.store.set_position(self.slot, value)
+        else:
+            self._position = value
+
+        self.mark_moved()
+
+    def mark_moved(self):
+        if self.world is not None:
+            self.world.moved[self.id] = self
+
+    @property
+    def is_static(self):
+        # Static objects never move once created
+        return self.physics is not None and self.physics.getMass() == 0 and not self.physics.isKinematic()
+
+    def get_bounds(self):
+        x, y, z = self.position
+        half_x, half_y, half_z = self.size[0] / 2, self.size[1] / 2, self.size[2] / 2
+
+        if not self.is_static:
+            # Moving objects may be rotated, so allow for any orientation
+            half_x = half_y = half_z = math.sqrt(half_x ** 2 + half_y ** 2 + half_z ** 2)
+
+        return (x - half_x, y - half_y, z - half_z), (x + half_x, y + half_y, z + half_z)
 
     def jump_to_position(self, value):
         if self.physics:
             self.physics.setTransform(TransformState.makePos(VBase3(value[0], value[1], value[2])))
 
-        self._position = value
+        self.sync_position(value)
 
     @property
     def x_rotation(self):
+        if self.store is not None:
+            return float(self.store.rotations[self.slot, 0])
+
         return self._x_rotation
 
     @x_rotation.setter
     def x_rotation(self, value):
-        self._x_rotation = value
+        if self.store is not None:
+            self.store.rotations[self.slot, 0] = value
+        else:
+            self._x_rotation = value
+
+        self.mark_moved()
 
     @property
     def y_rotation(self):
+        if self.store is not None:
+            return float(self.store.rotations[self.slot, 1])
+
         return self._y_rotation
 
     @y_rotation.setter
     def y_rotation(self, value):
-        self._y_rotation = value
+        if self.store is not None:
+            self.store.rotations[self.slot, 1] = value
+        else:
+            self._y_rotation = value
+
+        self.mark_moved()
 
     @property
     def z_rotation(self):
+        if self.store is not None:
+            return float(self.store.rotations[self.slot, 2])
+
         return self._z_rotation
 
     @z_rotation.setter
     def z_rotation(self, value):
-        self._z_rotation = value
+        if self.store is not None:
+            self.store.rotations[self.slot, 2] = value
+        else:
+            self._z_rotation = value
+
+        self.mark_moved()
+
+    def attach_store(self, store):
+        # Move the transform into the store, the attributes go stale until detach_store
+        self.slot = store.allocate(self, self.position, (self.x_rotation, self.y_rotation, self.z_rotation),
+                                   self.size)
+        self.store = store
+
+    def detach_store(self):
+        store = self.store
+        position = self.position
+        self._x_rotation, self._y_rotation, self._z_rotation = store.rotations[self.slot].tolist()
+
+        self.store = None
+        self._position = position
+        store.release(self.slot)
+        self.slot = -1
 
     @property
     def is_collision_source(self):
@@ -107,14 +219,37 @@ class GameObject:
     def is_collision_source(self, value):
         self._is_collision_source = value
 
+        if self.world:
+            self.world.collision_source_changed(self)
+
     def selected(self):
-         self.is_selected = True
+        self.is_selected = True
+
+        # The world view clears the selection after each frame
+        if self.world is not None:
+            self.world.selected[self.id] = self
 
     def tick(self, dt):
         pass
 
+    @classmethod
+    def wants_tick(cls):
+        if cls.ticks is not None:
+            return cls.ticks
+
+        return cls.tick is not GameObject.tick
+
     def clicked(self):
         pass
 
     def collision(self, other):
         print(f"{self.kind} collides with {other.kind}")
+
+    def collision_enter(self, other):
+        self.collision(other)
+
+    def collision_stay(self, other):
+        pass
+
+    def collision_exit(self, other):
+        pass
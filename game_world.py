@@ -1,11 +1,21 @@
-from panda3d.bullet import BulletWorld, BulletBoxShape, BulletRigidBodyNode, BulletCapsuleShape, ZUp, BulletPlaneShape, \
-    BulletCharacterControllerNode, BulletDebugNode
-from panda3d.core import Vec3, TransformState, VBase3, Point3
-from pubsub import pub
-import json
+from panda3d.bullet import BulletWorld, BulletRigidBodyNode, BulletPlaneShape, BulletCharacterControllerNode, \
+    BulletDebugNode
+from panda3d.core import Vec3, TransformState, VBase3, Point3, BitMask32, Quat
+from contextlib import contextmanager
+import numpy as np
+from collision_dispatcher import CollisionDispatcher
+from event_bus import EventBus
 from game_object import GameObject
+from level_cache import load_level
+from object_pool import ObjectPool
 from player import Player
+from shape_cache import ShapeCache
+from spatial_index import SpatialGrid
+from transform_store import TransformStore
+from static_baking import bake_regions, owner_of, region_key
 from teleporter import Teleporter
+from world_streaming import ChunkStreamer
+from world_snapshot import WorldSnapshot, is_simulated
 
 
 class GameWorld:
@@ -13,10 +23,78 @@ class GameWorld:
         self.properties = {}
         self.game_objects = {}
 
+        # Topics are looked up once here so sending an event is cheap.  The
+        # object topics always carry a list of game objects.
+        self.events = EventBus()
+        self.create_topic = self.events.topic('create')
+        self.destroy_topic = self.events.topic('destroy')
+        self.activate_topic = self.events.topic('activate')
+        self.deactivate_topic = self.events.topic('deactivate')
+        self.purge_topic = self.events.topic('purge')
+        self.property_topic = self.events.topic('property')
+        self.input_topic = self.events.topic('input')
+
+        # Inside batch() object events are held here and sent together
+        self.batch_depth = 0
+        self.pending_events = []
+
         self.next_id = 0
         self.physics_world = BulletWorld()
         self.physics_world.setGravity(Vec3(0, 0, -9.81))
-        self.physics_world.setDebugNode(debugNode)
+        if debugNode:
+            self.physics_world.setDebugNode(debugNode)
+
+        # Passed through to doPhysics.  Bullet's defaults are a single
+        # substep of 1/60 of a second.
+        self.max_substeps = 1
+        self.physics_step = 1.0 / 60.0
+
+        # Only objects with per-frame logic are ticked, and only collision
+        # sources are looked at for collisions
+        self.tickers = {}
+        self.sleeping = set()
+
+        # Objects whose transform changed this frame and in the last tick,
+        # and the objects selected this frame
+        self.moved = {}
+        self.last_moved = {}
+        self.selected = {}
+
+        # The dynamic objects Bullet moves by itself, rather than us
+        self.simulated = {}
+
+        self.collision_sources = {}
+        self.collisions = CollisionDispatcher(self.physics_world, self.collision_sources)
+
+        # Objects of the same shape and size share one collision shape
+        self.shapes = ShapeCache()
+
+        # Finds objects by location.  Static objects are indexed once,
+        # anything that can move is re-indexed after every physics step.
+        self.spatial_index = SpatialGrid()
+        self.dynamic_objects = {}
+
+        # Set by enable_streaming, otherwise every object is always live
+        self.streamer = None
+
+        # Set by enable_transform_store, otherwise objects keep their own transforms
+        self.transforms = None
+
+        # Filled by bake_static, maps the id of each baked object to its region
+        self.baked = {}
+
+        # Destroyed objects wait here to be reused by create_object
+        self.pool = ObjectPool()
+
+        # Kccs driving game objects, by object id, so snapshots include them
+        self.characters = {}
+
+        # What reset() goes back to, see mark_initial_state
+        self.initial_state = None
+
+        # What load_world created for each entry in the level file, by
+        # stable key, so reload_world can tell what changed
+        self.level_entries = {}
 
         self.kind_to_shape = {
             "crate": self.create_box,
@@ -34,32 +112,31 @@ class GameWorld:
     def create_capsule(self, position, size, kind, mass):
         radius = size[0]
         height = size[1]
-        shape = BulletCapsuleShape(radius, height, ZUp)
+        shape, shape_key = self.shapes.capsule(radius, height)
         # node = BulletCharacterControllerNode(shape, radius, kind)
         node = BulletRigidBodyNode(kind)
         node.setMass(mass)
         node.addShape(shape)
+        node.setPythonTag("shape_key", shape_key)
         node.setRestitution(0.0)
         # node.setKinematic(True)
 
         node.setTransform(TransformState.makePos(VBase3(position[0], position[1], position[2])))
 
+        # Attached by add_object, if the object is live
         # self.physics_world.attachCharacter(node)
-        self.physics_world.attachRigidBody(node)
 
         return node
 
     def create_box(self, position, size, kind, mass):
-        # The box shape needs half the size in each dimension
-        shape = BulletBoxShape(Vec3(size[0] / 2, size[1] / 2, size[2] / 2))
+        shape, shape_key = self.shapes.box(size)
         node = BulletRigidBodyNode(kind)
         node.setMass(mass)
         node.addShape(shape)
+        node.setPythonTag("shape_key", shape_key)
         node.setTransform(TransformState.makePos(VBase3(position[0], position[1], position[2])))
         node.setRestitution(0.0)
 
-        self.physics_world.attachRigidBody(node)
-
         return node
 
     def create_physics_object(self, position, kind, size, mass):
@@ -69,53 +146,510 @@ class GameWorld:
         return None
 
     def create_object(self, position, kind, size, mass, subclass):
-        physics = self.create_physics_object(position, kind, size, mass)
-        obj = subclass(position, kind, self.next_id, size, physics)
+        obj = self.new_object(position, kind, size, mass, subclass)
+        self.spatial_index.insert(obj, obj.get_bounds())
+        self.add_object(obj)
+        return obj
 
-        self.next_id += 1
-        self.game_objects[obj.id] = obj
+    def create_objects(self, batch, region_size=None):
+        """
+        Create many objects at once.  Each entry of batch holds the arguments
+        to create_object, optionally followed by a collision source flag.
+        Returns the objects in the same order.
+
+        This is much faster than calling create_object for each one, the
+        objects go into the spatial index together and everyone hears about
+        all of them in a single create event.
+
+        Attaching a body gets slower the more bodies Bullet has, so for big
+        batches pass region_size to bake the new static boxes straight into
+        regions as bake_static would, without attaching them one by one.
+        """
+        objects = []
+        for entry in batch:
+            obj = self.new_object(*entry[:5])
+            if len(entry) > 5 and entry[5]:
+                obj.is_collision_source = True
+            objects.append(obj)
+
+        self.spatial_index.insert_many([(obj, obj.get_bounds()) for obj in objects])
+
+        if region_size and self.streamer is None:
+            self.attach_regions(bake_regions([obj for obj in objects if self.is_bakeable(obj)], region_size))
+
+        with self.batch():
+            for obj in objects:
+                self.add_object(obj, obj.id not in self.baked)
+
+        return objects
+
+    def new_object(self, position, kind, size, mass, subclass):
+        obj = self.pool.take(kind, subclass, size)
+        if obj:
+            # A parked object keeps its id, physics node and view
+            if obj.physics and obj.physics.getMass() != mass:
+                obj.physics.setMass(mass)
+
+            obj.revived(position)
+        else:
+            physics = self.create_physics_object(position, kind, size, mass)
+            obj = subclass(position, kind, self.next_id, size, physics)
+
+            self.next_id += 1
 
-        pub.sendMessage('create', game_object=obj)
         return obj
 
+    def add_object(self, obj, attach=True):
+        # Everything but the spatial index, which create_objects fills in bulk
+        self.game_objects[obj.id] = obj
+
+        if not obj.is_static:
+            self.dynamic_objects[obj.id] = obj
+            if is_simulated(obj.physics):
+                self.simulated[obj.id] = obj
+
+        # Objects created in a chunk that isn't live yet stay out of the physics world
+        if attach and obj.physics and (self.streamer is None or self.streamer.add(obj)):
+            self.physics_world.attachRigidBody(obj.physics)
+
+        # Objects that want input get it straight from the input topic
+        if obj.input_event:
+            self.input_topic.subscribe(obj.input_event)
+
+        obj.world = self
+        if self.transforms is not None:
+            obj.attach_store(self.transforms)
+        if obj.wants_tick():
+            self.tickers[obj.id] = obj
+        if obj.is_collision_source:
+            self.collision_sources[obj.id] = obj
+
+        self.notify(self.create_topic, obj)
+
+    def destroy_object(self, game_object, recycle=True, attached=True):
+        """
+        Remove an object from the world.  If recycle is set and there's room
+        the object is parked in the pool for create_object to reuse.  Pass
+        attached=False for an object whose body is already out of the
+        physics world.
+        """
+        region = self.baked.get(game_object.id)
+        if region:
+            self.unbake_region(region)
+
+        active = attached and self.is_active(game_object)
+
+        game_object.deleted()
+        if game_object.physics and active:
+            self.physics_world.removeRigidBody(game_object.physics)
+
+        # Parked objects hold on to their shape until the pool is purged
+        if not (recycle and self.pool.park(game_object)):
+            self.release_shape(game_object)
+
+        del self.game_objects[game_object.id]
+        self.dynamic_objects.pop(game_object.id, None)
+        self.simulated.pop(game_object.id, None)
+        self.moved.pop(game_object.id, None)
+        self.last_moved.pop(game_object.id, None)
+        self.selected.pop(game_object.id, None)
+        self.spatial_index.remove(game_object)
+        self.collisions.forget(game_object)
+        if self.streamer:
+            self.streamer.remove(game_object)
+
+        if game_object.input_event:
+            self.input_topic.unsubscribe(game_object.input_event)
+
+        game_object.world = None
+        if game_object.store is not None:
+            game_object.detach_store()
+        self.characters.pop(game_object.id, None)
+        self.tickers.pop(game_object.id, None)
+        self.sleeping.discard(game_object.id)
+        self.collision_sources.pop(game_object.id, None)
+
+        self.notify(self.destroy_topic, game_object)
+
+    def release_shape(self, game_object):
+        if game_object.physics:
+            shape_key = game_object.physics.getPythonTag("shape_key")
+            if shape_key is not None:
+                self.shapes.release(shape_key)
+
+    def purge_pool(self):
+        objects = self.pool.drain()
+        for game_object in objects:
+            self.release_shape(game_object)
+
+        self.shapes.purge()
+        if objects:
+            self.purge_topic.send(objects)
+
+    def notify(self, topic, game_object):
+        if self.batch_depth:
+            self.pending_events.append((topic, game_object))
+        else:
+            topic.send([game_object])
+
+    @contextmanager
+    def batch(self):
+        """
+        Hold back object events until the end of the block, then send each
+        run of the same event as one list.  Order is kept, so a destroy
+        followed by a create still arrives in that order.
+        """
+        self.batch_depth += 1
+        try:
+            yield
+        finally:
+            self.batch_depth -= 1
+            if not self.batch_depth:
+                self.flush_events()
+
+    def flush_events(self):
+        pending = self.pending_events
+        self.pending_events = []
+
+        topic = None
+        objects = []
+        for event_topic, game_object in pending:
+            if event_topic is not topic:
+                if objects:
+                    topic.send(objects)
+                topic = event_topic
+                objects = []
+
+            objects.append(game_object)
+
+        if objects:
+            topic.send(objects)
+
+    def enable_streaming(self, chunk_size=32.0, radius=64.0, hysteresis=16.0):
+        """
+        Only keep static objects near the focus given to update_streaming
+        in the physics world and scene.  Until the first update nothing
+        streamed is live.
+        """
+        if self.streamer:
+            return
+
+        self.unbake_static()
+        self.streamer = ChunkStreamer(self, chunk_size, radius, hysteresis)
+        with self.batch():
+            for game_object in self.game_objects.values():
+                if not self.streamer.add(game_object):
+                    self.deactivate_object(game_object)
+
+    def bake_static(self, region_size=32.0):
+        """
+        Merge static boxes into one compound body per region so Bullet has
+        far fewer bodies to sort through.  Collision sources and streamed
+        objects are left as they are.  Use owner_of to find the object behind
+        a hit on a baked body.
+
+        Returns the number of regions built.
+        """
+        self.unbake_static()
+
+        candidates = [game_object for game_object in self.game_objects.values() if self.is_bakeable(game_object)]
+        return len(self.bake_objects(candidates, region_size))
+
+    def bake_objects(self, game_objects, region_size):
+        # Swap loose, attached bodies for regions
+        regions = bake_regions(game_objects, region_size)
+        for region in regions:
+            for game_object in region.objects:
+                self.physics_world.removeRigidBody(game_object.physics)
+
+        self.attach_regions(regions)
+        return regions
+
+    def is_bakeable(self, game_object):
+        return (game_object.is_static and not game_object.is_collision_source
+                and game_object.physics.getPythonTag("shape_key") is not None
+                and (self.streamer is None or game_object.id not in self.streamer.object_chunks))
+
+    def attach_regions(self, regions):
+        for region in regions:
+            for game_object in region.objects:
+                self.baked[game_object.id] = region
+
+            self.physics_world.attachRigidBody(region.node)
+
+    def unbake_static(self):
+        for region in set(self.baked.values()):
+            self.unbake_region(region)
+
+    def rebake_regions(self, regions, game_objects=(), region_size=None):
+        """
+        Bake what's left of regions that were unbaked, once a batch of
+        edits is done with them.  Destroyed objects are left out and moved
+        ones join whichever region they're in now.  Loose game_objects are
+        baked along with them if region_size is given.  Regions already in
+        the cells all these land in are rebuilt with them, so each cell
+        still ends up with one region.
+        """
+        sizes = {region.size for region in regions}
+        if region_size:
+            sizes.add(region_size)
+
+        for size in sizes:
+            candidates = [game_object for region in regions if region.size == size for game_object in region.objects]
+            if size == region_size:
+                candidates.extend(game_objects)
+
+            loose = [game_object for game_object in candidates
+                     if self.game_objects.get(game_object.id) is game_object
+                     and game_object.id not in self.baked and self.is_bakeable(game_object)]
+            if not loose:
+                continue
+
+            cells = {region_key(game_object, size) for game_object in loose}
+            for region in {region for region in self.baked.values() if region.size == size and region.key in cells}:
+                self.unbake_region(region)
+                loose.extend(region.objects)
+
+            self.bake_objects(loose, size)
+
+    def unbake_region(self, region):
+        self.physics_world.removeRigidBody(region.node)
+
+        for game_object in region.objects:
+            del self.baked[game_object.id]
+            self.physics_world.attachRigidBody(game_object.physics)
+
+    def update_streaming(self, focus):
+        if self.streamer:
+            with self.batch():
+                self.streamer.update(focus)
+
+    def is_active(self, game_object):
+        return self.streamer is None or self.streamer.is_active(game_object)
+
+    def activate_object(self, game_object):
+        self.physics_world.attachRigidBody(game_object.physics)
+        self.notify(self.activate_topic, game_object)
+
+    def deactivate_object(self, game_object):
+        # Listeners let go of whatever they hold for the object, its view
+        # included, so only the area around the focus stays resident
+        self.physics_world.removeRigidBody(game_object.physics)
+        self.collisions.forget(game_object)
+        self.notify(self.deactivate_topic, game_object)
+
+    def collision_source_changed(self, game_object):
+        if game_object.is_collision_source:
+            self.collision_sources[game_object.id] = game_object
+        else:
+            self.collision_sources.pop(game_object.id, None)
+
+    def sleep_object(self, game_object):
+        """
+        Stop calling tick on an object until wake_object is called.  Sleeping
+        objects are still simulated and still collide.
+        """
+        if self.tickers.pop(game_object.id, None):
+            self.sleeping.add(game_object.id)
+
+    def wake_object(self, game_object):
+        if game_object.id in self.sleeping:
+            self.sleeping.discard(game_object.id)
+            self.tickers[game_object.id] = game_object
+
+    def is_sleeping(self, game_object):
+        return game_object.id in self.sleeping
+
     def tick(self, dt):
-        for id in self.game_objects:
-            self.game_objects[id].tick(dt)
+        # Copied since a tick may create, destroy or sleep objects
+        for game_object in list(self.tickers.values()):
+            game_object.tick(dt)
+
+        self.physics_world.doPhysics(dt, self.max_substeps, self.physics_step)
+        self.sync_transforms()
+
+        # Only what moved needs re-indexing, static objects are moved
+        # through move_object which does it itself
+        dynamic_objects = self.dynamic_objects
+        for id, game_object in self.moved.items():
+            if id in dynamic_objects:
+                self.spatial_index.update(game_object, game_object.get_bounds())
+
+        # Kept for the world view, which only updates views of what moved
+        self.last_moved = self.moved
+        self.moved = {}
+
+        # Notify objects about collisions from this step
+        self.collisions.dispatch()
+
+    def enable_transform_store(self, capacity=1024):
+        """
+        Keep every object's position, rotation and size in one TransformStore
+        so they can be read in bulk, see positions().  Reading an object's
+        position is then an array lookup instead of a call into the physics
+        engine.  Bodies Bullet moves are copied into the store after each
+        physics step.
+        """
+        if self.transforms is not None:
+            return
+
+        self.transforms = TransformStore(capacity)
+        for game_object in self.game_objects.values():
+            game_object.attach_store(self.transforms)
+
+    def sync_transforms(self):
+        # Copy where Bullet put things into the objects.  Bodies that have
+        # gone to sleep haven't moved, so an idle scene costs next to nothing.
+        for game_object in self.simulated.values():
+            physics = game_object.physics
+            if physics.isActive():
+                game_object.sync_position(physics.getTransform().getPos())
+
+    def positions(self):
+        """
+        The ids and positions of every object as two arrays.  Needs the
+        transform store.
+        """
+        ids, positions, rotations, sizes = self.transforms.state()
+        return ids, positions
+
+    def load_world(self, filename, region_size=None):
+        """
+        Replace everything in the world with the contents of a level file.
+        Pass region_size to bake its static boxes into regions as they're
+        created, see create_objects.
+        """
+        with self.batch():
+            self.clear_world()
+            self.level_entries = {}
+
+            # Free shapes nothing uses any more.  Done here rather than in
+            # destroy_object so shapes survive objects being destroyed and
+            # recreated in between loads.
+            self.shapes.purge()
+
+            level = load_level(filename)
+            if level is None:
+                return False
 
-        for id in self.game_objects:
-            if self.game_objects[id].is_collision_source:
-                contacts = self.get_all_contacts(self.game_objects[id])
+            objects = self.create_level(level, region_size)
+
+            for key, obj, entry in zip(level.stable_keys(), objects, level.entries()):
+                self.level_entries[key] = (obj.id, entry)
+
+    def clear_world(self):
+        """
+        Destroy every object.  Baked regions go first, without putting their
+        objects back into the physics world one by one on the way out.
+        """
+        for region in set(self.baked.values()):
+            self.physics_world.removeRigidBody(region.node)
+
+        baked, self.baked = self.baked, {}
+        for game_object in list(self.game_objects.values()):
+            self.destroy_object(game_object, attached=game_object.id not in baked)
+
+    def create_level(self, level, region_size=None):
+        """
+        Create everything in a Level, whether loaded from a file or built
+        in code, and return the objects in the level's order.  See
+        create_objects for region_size.
+        """
+        class_to_type = self.class_to_type
+        return self.create_objects(list(zip(level.positions, level.kinds, level.sizes, level.masses,
+                                            [class_to_type[class_name] for class_name in level.classes],
+                                            level.collision_sources)), region_size)
+
+    def reload_world(self, filename, region_size=None):
+        """
+        Bring the world in line with an edited level file, touching only the
+        objects whose entries changed since the level was last loaded.
+        Objects are matched up by their stable key, see Level.stable_keys.
+        New objects are created together, see create_objects for region_size.
+        """
+        with self.batch():
+            level = load_level(filename)
+            if level is None:
+                return False
 
-                for contact in contacts:
-                    if contact.getNode1() and contact.getNode1().getPythonTag("owner"):
-                        # Notify both objects about the collision
-                        contact.getNode1().getPythonTag("owner").collision(self.game_objects[id])
-                        self.game_objects[id].collision(contact.getNode1().getPythonTag("owner"))
+            old_entries = self.level_entries
+            self.level_entries = {}
 
-        self.physics_world.doPhysics(dt)
+            # Edits to baked objects unbake their regions, see the end
+            regions = set(self.baked.values())
 
-    def load_world(self, filename):
-        for id in self.game_objects:
-            self.game_objects[id].deleted()
-            if self.game_objects[id].physics:
-                self.physics_world.removeRigidBody(self.game_objects[id].physics)
+            keys = level.stable_keys({key: entry for key, (id, entry) in old_entries.items()})
 
-            pub.sendMessage('destroy', game_object=self.game_objects[id])
+            class_to_type = self.class_to_type
+            new_keys = []
+            new_objects = []
+            for key, entry in zip(keys, level.entries()):
+                position, kind, size, mass, class_name, collision_source = entry
 
-        self.game_objects.clear()
+                id, old_entry = old_entries.pop(key, (None, None))
+                obj = self.game_objects.get(id)
 
-        with open(filename) as infile:
-            level_data = json.load(infile)
-            if not "objects" in level_data:
-                return False
-            for game_object in level_data['objects']:
-                collision_source = False
-                if 'collision_source' in game_object:
-                    collision_source = game_object['collision_source']
+                if obj is not None and old_entry[1:5] != entry[1:5]:
+                    # Kind, size, mass or class changed, so it has to be rebuilt
+                    self.destroy_object(obj)
+                    obj = None
+
+                if obj is None:
+                    new_keys.append((key, entry))
+                    new_objects.append((position, kind, list(size), mass, class_to_type[class_name], collision_source))
+                    continue
+
+                if old_entry[0] != entry[0]:
+                    self.move_object(obj, position)
+
+                if old_entry[5] != entry[5]:
+                    obj.is_collision_source = collision_source
 
-                class_object = self.class_to_type[game_object['class']]
-                obj = self.create_object(game_object['position'], game_object['kind'], game_object['size'], game_object['mass'], class_object)
-                obj.is_collision_source = collision_source
+                self.level_entries[key] = (obj.id, entry)
+
+            created = self.create_objects(new_objects, region_size)
+            for (key, entry), obj in zip(new_keys, created):
+                self.level_entries[key] = (obj.id, entry)
+
+            # Whatever is left was taken out of the file
+            for id, _ in old_entries.values():
+                if id in self.game_objects:
+                    self.destroy_object(self.game_objects[id])
+
+            self.rebake_regions(regions.difference(self.baked.values()), created, region_size)
+            return True
+
+    def move_object(self, game_object, position):
+        """
+        Put an object somewhere else, keeping everything that tracks
+        objects by location up to date.
+        """
+        region = self.baked.get(game_object.id)
+        if region:
+            self.unbake_region(region)
+
+        game_object.jump_to_position(position)
+        if game_object.physics:
+            game_object.physics.setLinearVelocity(Vec3(0, 0, 0))
+            game_object.physics.setAngularVelocity(Vec3(0, 0, 0))
+
+        self.spatial_index.update(game_object, game_object.get_bounds())
+
+        if self.streamer:
+            was_active = self.streamer.is_active(game_object)
+            self.streamer.remove(game_object)
+            now_active = self.streamer.add(game_object)
+
+            if was_active and not now_active:
+                self.deactivate_object(game_object)
+            elif now_active and not was_active:
+                self.activate_object(game_object)
+
+    def set_physics_rate(self, step, max_substeps):
+        # Bullet drops any time beyond max_substeps * step, so callers
+        # stepping with a fixed dt should pick step = dt / max_substeps
+        self.physics_step = step
+        self.max_substeps = max_substeps
 
     def get_property(self, key):
         if key in self.properties:
@@ -126,7 +660,7 @@ class GameWorld:
     def set_property(self, key, value):
         self.properties[key] = value
 
-        pub.sendMessage('property', key=key, value=value)
+        self.property_topic.send(key, value)
 
     def get_nearest(self, from_pt, to_pt):
         # This shows the technique of near object detection using the physics engine.
@@ -135,6 +669,84 @@ class GameWorld:
         result = self.physics_world.rayTestClosest(Point3(fx, fy, fz), Point3(tx, ty, tz))
         return result
 
+    def ray_test_batch(self, origins, directions, max_dist, mask=None):
+        """
+        Cast many rays in one call and get the closest hit of each.
+
+        origins and directions are (N, 3) arrays, directions don't need to be
+        normalized.  max_dist is either one length for every ray or N lengths.
+        mask is a BitMask32 or int, by default rays hit everything.
+
+        Returns four arrays: hits (N bools), hit positions (N, 3), hit normals
+        (N, 3) and the id of the hit object's owner (N, -1 for no hit or no owner).
+        """
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+
+        lengths = np.linalg.norm(directions, axis=1)
+        lengths[lengths == 0.0] = 1.0
+        scale = np.broadcast_to(np.asarray(max_dist, dtype=np.float64), lengths.shape) / lengths
+        ends = origins + directions * scale[:, None]
+
+        # Bullet's own default, so every ray goes through the same call
+        if mask is None:
+            mask = BitMask32.allOn()
+        elif not isinstance(mask, BitMask32):
+            mask = BitMask32(mask)
+
+        count = len(origins)
+        hits = np.zeros(count, dtype=bool)
+        positions = np.zeros((count, 3))
+        normals = np.zeros((count, 3))
+        owner_ids = np.full(count, -1, dtype=np.int64)
+
+        # Panda's Bullet has no batched ray test, so each ray is still its
+        # own rayTestClosest.  Everything else per ray stays in plain Python,
+        # reusing the same two points, and is written back to the arrays in
+        # one go at the end.
+        ray_test = self.physics_world.rayTestClosest
+        start = Point3()
+        end = Point3()
+        hit_rows = []
+        hit_positions = []
+        hit_normals = []
+        hit_owners = []
+
+        for i, (x0, y0, z0, x1, y1, z1) in enumerate(np.hstack((origins, ends)).tolist()):
+            start.set(x0, y0, z0)
+            end.set(x1, y1, z1)
+            result = ray_test(start, end, mask)
+
+            if not result.hasHit():
+                continue
+
+            hit_rows.append(i)
+            hit_positions.append(tuple(result.getHitPos()))
+            hit_normals.append(tuple(result.getHitNormal()))
+
+            owner = owner_of(result.getNode(), result.getTriangleIndex())
+            hit_owners.append(owner.id if owner is not None else -1)
+
+        if hit_rows:
+            hits[hit_rows] = True
+            positions[hit_rows] = hit_positions
+            normals[hit_rows] = hit_normals
+            owner_ids[hit_rows] = hit_owners
+
+        return hits, positions, normals, owner_ids
+
+    def query_aabb(self, lo, hi):
+        # Game objects whose bounds overlap the box from lo to hi
+        return self.spatial_index.query_aabb(lo, hi)
+
+    def query_radius(self, center, radius):
+        # Game objects whose bounds come within radius of center
+        return self.spatial_index.query_radius(center, radius)
+
+    def nearest_k(self, point, k):
+        # The k game objects closest to point, closest first
+        return self.spatial_index.nearest_k(point, k)
+
     # TODO: use this to demonstrate a teleporting trap
     def get_all_contacts(self, game_object):
         if game_object.physics:
@@ -142,5 +754,71 @@ class GameWorld:
 
         return []
 
+    def register_character(self, character):
+        self.characters[character.game_object.id] = character
+
+    def snapshot(self):
+        """
+        Capture where everything is and how it's moving so restore can put
+        it back later, for restarts and checkpoints.
+        """
+        return WorldSnapshot.capture(self)
+
+    def restore(self, snapshot):
+        """
+        Put the world back the way it was when the snapshot was taken.  The
+        existing physics nodes and views are reused.  Objects created since
+        are destroyed, but objects destroyed since can't be brought back.
+        """
+        with self.batch():
+            keep = set(snapshot.ids.tolist())
+            keep.update(snapshot.static_ids.tolist())
+            for game_object in [game_object for id, game_object in self.game_objects.items() if id not in keep]:
+                self.destroy_object(game_object)
+
+            game_objects = self.game_objects
+            for id, transform, velocity, rotation in zip(snapshot.ids.tolist(), snapshot.transforms.tolist(),
+                                                         snapshot.velocities.tolist(), snapshot.rotations.tolist()):
+                game_object = game_objects.get(id)
+                if game_object is None:
+                    continue
+
+                game_object.x_rotation, game_object.y_rotation, game_object.z_rotation = rotation
+
+                physics = game_object.physics
+                if is_simulated(physics):
+                    physics.setTransform(TransformState.makePosQuatScale(Point3(*transform[:3]), Quat(*transform[3:]), Vec3(1, 1, 1)))
+                    physics.setLinearVelocity(Vec3(*velocity[:3]))
+                    physics.setAngularVelocity(Vec3(*velocity[3:]))
+                    physics.clearForces()
+                    physics.setActive(True)
+
+                    game_object.sync_position(tuple(transform[:3]))
+                else:
+                    game_object.position = tuple(transform[:3])
+
+                self.spatial_index.update(game_object, game_object.get_bounds())
+
+            for id, state in snapshot.characters.items():
+                character = self.characters.get(id)
+                if character:
+                    character.set_state(state)
+
+            self.properties = dict(snapshot.properties)
+
+            # Contacts are worked out afresh on the next step
+            self.collisions.clear()
+
+    def mark_initial_state(self):
+        self.initial_state = self.snapshot()
+
     def reset(self):
-        pass
+        """
+        Go back to the state saved by mark_initial_state.  Returns False if
+        there isn't one.
+        """
+        if self.initial_state is None:
+            return False
+
+        self.restore(self.initial_state)
+        return True
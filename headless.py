@@ -0,0 +1,158 @@
+import time
+
+from panda3d.core import NodePath
+
+from character_manager import CharacterManager
+from fixed_step import FixedStepClock
+from game_world import GameWorld
+from input_log import InputLog
+from obstacle_course import ObstacleCourse
+from player_controls import PlayerControls
+
+
+class HeadlessGame(PlayerControls):
+    """
+    Runs the obstacle game without a window.  The world is only advanced
+    when step() or advance() is called, always by a fixed dt, so it runs as
+    fast as the CPU allows instead of at the display's frame rate.
+    """
+
+    def __init__(self, level=None, step_size=1.0 / 60.0, substeps=1, course=None, region_size=None):
+        """
+        level -- a level file to load instead of building a course
+        course -- what builds the course, called with the game world,
+                  ObstacleCourse by default
+        region_size -- bake the level's static boxes into regions this
+                       size as it loads, see GameWorld.create_objects
+        """
+        # The kcc needs somewhere to parent its nodes, but nothing is rendered
+        self.render = NodePath("headless")
+
+        self.game_world = GameWorld(None)
+        self.game_world.set_physics_rate(step_size / substeps, substeps)
+
+        self.clock = FixedStepClock(step_size)
+        self.frame = 0
+
+        # Every player object gets a kcc, the first one is ours
+        self.characters = CharacterManager(self.game_world, self.render)
+
+        self.course = None
+        if level:
+            self.game_world.load_world(level, region_size)
+        else:
+            self.course = (course or ObstacleCourse)(self.game_world)
+            self.course.build()
+
+        self.player = self.characters.player
+        self.game_world.mark_initial_state()
+
+        self.input_events = {}
+        self.held = set()
+
+        # Set to an InputRecorder to record every step
+        self.recorder = None
+        self.game_world.input_topic.subscribe(self.handle_input)
+
+    def is_key_held(self, key):
+        return key in self.held
+
+    @property
+    def step_size(self):
+        return self.clock.step_size
+
+    def step(self, events=(), held=(), dt=None):
+        """
+        Advance the game by exactly one fixed step.
+
+        events -- names from controls that fired this step, e.g. 'jump'
+        held -- names from held_keys that are down this step, e.g. 'moveForward'
+        dt -- step by this much instead of the fixed step size
+        """
+        for event in events:
+            self.input_events[event] = True
+        self.held = set(held)
+
+        if dt is None:
+            dt = self.clock.step_size
+
+        if self.recorder is not None:
+            self.recorder.record(dt, self.input_events, self.held, self.player.getH() if self.player else 0.0)
+
+        if self.player:
+            self.game_world.input_topic.send(self.input_events)
+            self.move_player(self.input_events)
+            self.game_world.update_streaming(self.player.getPos())
+
+        self.characters.update(dt)
+        self.game_world.tick(dt)
+
+        self.input_events.clear()
+        self.frame += 1
+
+    def advance(self, elapsed, events=(), held=()):
+        """
+        Feed real elapsed time through the accumulator and run however many
+        fixed steps it works out to.  Events are only delivered on the first.
+        """
+        steps = self.clock.advance(elapsed)
+        for i in range(steps):
+            self.step(events if i == 0 else (), held)
+
+        return steps
+
+    def run(self, frames, held=()):
+        """
+        Step the game frames times as fast as possible and return the
+        achieved simulation rate in frames per second.
+        """
+        start = time.perf_counter()
+        for _ in range(frames):
+            self.step((), held)
+        elapsed = time.perf_counter() - start
+
+        if elapsed <= 0:
+            return float('inf')
+
+        return frames / elapsed
+
+    def replay(self, log, fixed_step=False):
+        """
+        Play back an input log (or the name of one) frame by frame and
+        return the achieved simulation rate in frames per second.  Frames
+        are stepped by their recorded dt, hitches included, unless
+        fixed_step is set.
+        """
+        if not isinstance(log, InputLog):
+            log = InputLog.load(log)
+
+        start = time.perf_counter()
+        for dt, events, held, heading in log:
+            self.set_heading(heading)
+            self.step(events, held, None if fixed_step else dt)
+        elapsed = time.perf_counter() - start
+
+        if elapsed <= 0:
+            return float('inf')
+
+        return len(log) / elapsed
+
+    def set_heading(self, h):
+        if self.player:
+            self.player.setH(h)
+
+    def player_position(self):
+        return self.player.getPos()
+
+
+if __name__ == '__main__':
+    import sys
+
+    game = HeadlessGame()
+    if len(sys.argv) > 1:
+        # Replay an input log recorded with obstacle_game.py --record
+        rate = game.replay(sys.argv[1])
+    else:
+        rate = game.run(2000, held=('moveForward',))
+    print(f"Simulated {game.frame} frames at {rate:.0f} frames per second")
+    print(f"Player position: {game.player_position()}")
@@ -0,0 +1,106 @@
+import json
+import struct
+
+import numpy as np
+
+from player_controls import controls, held_keys
+
+# An input log is a small header followed by one fixed size record per
+# frame, laid out like a compiled level.
+#
+#   magic (4 bytes) | version (uint32) | header length (uint32) | header (JSON) | frames
+#
+# The header holds the frame count and the event and held key names that
+# the bits of each frame's masks stand for, so a log still reads correctly
+# after the controls change.
+MAGIC = b'CPIN'
+VERSION = 1
+PREFIX = struct.Struct('<4sII')
+
+FRAME = np.dtype([
+    ('dt', '<f8'),
+    ('events', '<u4'),
+    ('held', '<u4'),
+    ('heading', '<f8'),
+])
+
+EVENT_NAMES = list(dict.fromkeys(controls.values()))
+HELD_NAMES = list(dict.fromkeys(held_keys.values()))
+
+
+def to_mask(names, active):
+    mask = 0
+    for bit, name in enumerate(names):
+        if name in active:
+            mask |= 1 << bit
+
+    return mask
+
+
+def from_mask(names, mask):
+    return tuple(name for bit, name in enumerate(names) if mask & (1 << bit))
+
+
+class InputRecorder:
+    """
+    Collects the input and frame time of every frame so the session can be
+    replayed later.  Call record() once per frame, right before the world
+    is stepped, and save() at the end.
+    """
+
+    def __init__(self):
+        self.frames = []
+
+    def __len__(self):
+        return len(self.frames)
+
+    def record(self, dt, events, held, heading):
+        self.frames.append((dt, to_mask(EVENT_NAMES, events), to_mask(HELD_NAMES, held), heading))
+
+    def save(self, filename):
+        frames = np.array(self.frames, dtype=FRAME)
+
+        header = json.dumps({'count': len(frames), 'events': EVENT_NAMES, 'held': HELD_NAMES}).encode()
+        header += b' ' * (-(PREFIX.size + len(header)) % 8)
+
+        with open(filename, 'wb') as outfile:
+            outfile.write(PREFIX.pack(MAGIC, VERSION, len(header)))
+            outfile.write(header)
+            outfile.write(frames.tobytes())
+
+
+class InputLog:
+    """
+    A saved recording.  Iterating gives (dt, events, held, heading) for each
+    frame, with events and held as tuples of names.
+    """
+
+    def __init__(self, frames, event_names, held_names):
+        self.frames = frames
+        self.event_names = event_names
+        self.held_names = held_names
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __iter__(self):
+        event_names = self.event_names
+        held_names = self.held_names
+        for dt, events, held, heading in self.frames.tolist():
+            yield dt, from_mask(event_names, events), from_mask(held_names, held), heading
+
+    @property
+    def duration(self):
+        return float(self.frames['dt'].sum())
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as infile:
+            magic, version, header_length = PREFIX.unpack(infile.read(PREFIX.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{filename} is not an input log")
+
+            header = json.loads(infile.read(header_length))
+            frames = np.frombuffer(infile.read(), dtype=FRAME, count=header['count'])
+
+        return cls(frames, header['events'], header['held'])
@@ -1,7 +1,19 @@
-from panda3d.core import Vec3, Point3, Quat, BitMask32
+from panda3d.core import Vec3, Point3, BitMask32, TransformState
 from panda3d.bullet import BulletCapsuleShape, BulletRigidBodyNode, BulletGhostNode
 
 import math
+import time
+
+from kcc_telemetry import STATE, FOOT, HEAD, CEILING, PENETRATION, UPDATE, STATE_CODES
+
+# The capsule ghosts only collide through this bit, and the foot and head
+# probes leave it out so they never see a ghost
+GHOST_MASK = BitMask32.bit(31)
+PROBE_MASK = BitMask32.allOn() & ~GHOST_MASK
+
+# Compared against every update, never changed
+ZERO = Vec3(0, 0, 0)
+UP = Vec3.up()
 
 class PandaBulletCharacterController:
     """
@@ -46,6 +58,27 @@ class PandaBulletCharacterController:
         self.__timeStep = 0
         self.game_object = game_object
 
+        # The update works on these in place rather than making new
+        # vectors.  __pos is where the character is, read from the game
+        # object at the start of each update and written back at the end
+        # if it changed, __writtenPos is what was last written.
+        x, y, z = game_object.position
+        self.__pos = Vec3(x, y, z)
+        self.__writtenPos = Vec3(x, y, z)
+        self.__globalVel = Vec3()
+        self.__push = Vec3()
+        self.__rayFrom = Point3()
+        self.__rayTo = Point3()
+        self.__linearVelocity = Vec3(0, 0, 0)
+
+        # What the foot and head probes hit, the node is None if nothing.
+        # The points are copied into, never replaced
+        self.__footNode = None
+        self.__footPos = Point3()
+        self.__footNormal = Vec3()
+        self.__headNode = None
+        self.__headPos = Point3()
+
         self.movementParent = self.__parent.attachNewNode("Movement Parent")
         self.__setup(walkHeight, crouchHeight, stepHeight, radius)
         self.__mapMethods()
@@ -71,33 +104,79 @@ class PandaBulletCharacterController:
         self.predictFutureSpace = False
         self.futureSpacePredictionDistance = 10.0
 
+        # Move by sweeping the capsule along the way and sliding along
+        # whatever it runs into, instead of moving it blindly and pushing
+        # it back out with a contact test.  Walls can't be tunnelled
+        # through however fast we go.  At most maxSweeps sweeps are made
+        # per update, sweepTests counts them.  Jumps and falls are checked
+        # all the way with the head and foot probes, so floors and
+        # ceilings can't be either.
+        self.sweepMovement = False
+        self.maxSweeps = 3
+        self.sweepTests = 0
+
         self.isCrouching = False
 
         self.__fallTime = 0.0
-        self.__fallStartPos = self.__currentPos.z
-        self.__linearVelocity = Vec3(0, 0, 0)
-        self.__headContact = None
-        self.__footContact = None
+        self.__fallStartPos = self.__pos.z
         self.__enabledCrouch = False
 
+        self.__processStates = {
+            "ground": self.__processGround,
+            "jumping": self.__processJumping,
+            "falling": self.__processFalling,
+            "flying": self.__processFlying,
+        }
+
         self.__standUpCallback = [None, [], {}]
         self.__fallCallback = [None, [], {}]
 
+        # Standing still on static ground the probes would find the same
+        # thing every frame, so their results are kept for up to
+        # probeReuseFrames frames.  rayTests and reusedProbes count how
+        # many probes were cast and how many were skipped.
+        self.probeReuseFrames = 10
+        self.rayTests = 0
+        self.reusedProbes = 0
+        self.__probePos = Vec3()
+        self.__probesValid = False
+        self.__probeAge = 0
+
+        # Bullet only picks up where the capsule is when the world steps.
+        # After a teleport or a capsule swap it's still wherever it was
+        # last used, where the probes could hit it, so until the next
+        # step they look past it.
+        self.__capsuleStale = True
+
+        # A Telemetry to record state changes, contacts, penetration and
+        # update times in, nothing is recorded if None
+        self.telemetry = None
+
     def set_game_object(self, game_object):
         self.__walkCapsuleNP.node().setPythonTag("owner", game_object)
         self.__crouchCapsuleNP.node().setPythonTag("owner", game_object)
+        self.__walkGhost.setPythonTag("owner", game_object)
+        self.__crouchGhost.setPythonTag("owner", game_object)
         game_object.physics = self.game_object.physics
 
         self.game_object = game_object
+        self.__readPosition()
         self.__updateCapsule()
 
-    @property
-    def __currentPos(self):
-        return Vec3(*self.game_object.position)
-
-    @__currentPos.setter
-    def __currentPos(self, value):
-         self.game_object.position = (value[0], value[1], value[2])
+    def __readPosition(self):
+        # Something else may have moved the game object, a teleporter say
+        x, y, z = self.game_object.position
+        written = self.__writtenPos
+        if x != written.x or y != written.y or z != written.z:
+            self.__capsuleStale = True
+        self.__pos.set(x, y, z)
+        written.set(x, y, z)
+
+    def __writePosition(self):
+        pos = self.__pos
+        if pos != self.__writtenPos:
+            self.__writtenPos.set(pos.x, pos.y, pos.z)
+            self.game_object.position = (pos.x, pos.y, pos.z)
 
     def setCollideMask(self, *args):
         self.__walkCapsuleNP.setCollideMask(*args)
@@ -143,6 +222,9 @@ class PandaBulletCharacterController:
         self.isCrouching = True
         self.__enabledCrouch = True
 
+        self.__useCrouchCapsule()
+
+    def __useCrouchCapsule(self):
         self.capsule = self.__crouchCapsule
         self.capsuleNP = self.__crouchCapsuleNP
 
@@ -150,12 +232,16 @@ class PandaBulletCharacterController:
 
         self.__world.removeRigidBody(self.__walkCapsuleNP.node())
         self.__world.attachRigidBody(self.__crouchCapsuleNP.node())
+        self.__world.remove(self.__walkGhost)
+        self.__world.attach(self.__crouchGhost)
 
         # Let the player know its new physics object
         self.game_object.physics = self.__crouchCapsuleNP.node()
 
         self.__capsuleOffset = self.__capsuleH * 0.5 + self.__levitation
         self.__footDistance = self.__capsuleOffset + self.__levitation
+        self.__probesValid = False
+        self.__capsuleStale = True
 
     def stopCrouch(self):
         """
@@ -167,13 +253,13 @@ class PandaBulletCharacterController:
         """
         Check if the character is on ground. You may also check if the movementState variable is set to 'ground'
         """
-        if self.__footContact is None:
+        if self.__footNode is None:
             return False
         elif self.movementState == "ground":
-            elevation = self.__currentPos.z - self.__footContact[0].z
+            elevation = self.__pos.z - self.__footPos.z
             return (elevation <= self.__levitation + 0.02)
         else:
-            return self.__currentPos <= self.__footContact[0]
+            return self.__pos <= self.__footPos
 
     def startJump(self, maxHeight=3.0):
         """
@@ -184,6 +270,9 @@ class PandaBulletCharacterController:
     def startFly(self):
         self.movementState = 'flying'
 
+        if self.telemetry is not None:
+            self.__log(STATE)
+
     def stopFly(self):
         """
         Stop flying and start falling
@@ -194,62 +283,159 @@ class PandaBulletCharacterController:
         self.movementParent.setH(self.movementParent, omega * self.__timeStep)
 
     def setLinearMovement(self, speed, *args):
-        self.__linearVelocity = speed
+        self.__linearVelocity.set(speed[0], speed[1], speed[2])
+
+    def get_state(self):
+        """
+        Everything needed to put the character back where it is now with
+        set_state, as a tuple of plain values.
+        """
+        pos = self.__pos
+        velocity = self.__linearVelocity
+        return (self.movementState, self.isCrouching, self.__enabledCrouch,
+                pos.x, pos.y, pos.z, self.movementParent.getH(),
+                velocity.x, velocity.y, velocity.z,
+                self.__fallTime, self.__fallStartPos, getattr(self, 'fallDelta', 0.0),
+                getattr(self, 'jumpTime', 0.0), getattr(self, 'jumpStartPos', 0.0),
+                getattr(self, 'jumpSpeed', 0.0), getattr(self, 'jumpMaxHeight', 0.0))
+
+    def set_state(self, state):
+        (movementState, isCrouching, enabledCrouch, x, y, z, h, vx, vy, vz,
+         self.__fallTime, self.__fallStartPos, self.fallDelta,
+         self.jumpTime, self.jumpStartPos, self.jumpSpeed, self.jumpMaxHeight) = state
+
+        # Swap capsules directly, restoring shouldn't wait for room to stand up
+        if isCrouching and not self.isCrouching:
+            self.__useCrouchCapsule()
+        elif self.isCrouching and not isCrouching:
+            self.__useWalkCapsule()
+
+        self.movementState = movementState
+        self.isCrouching = isCrouching
+        self.__enabledCrouch = enabledCrouch
+        self.__linearVelocity.set(vx, vy, vz)
+        self.__footNode = None
+        self.__headNode = None
+        self.__probesValid = False
+        self.__capsuleStale = True
+
+        self.setH(h)
+        self.__pos.set(x, y, z)
+        self.__updateCapsule()
 
     def update(self, timestep=None):
         """
         Update method. Call this around doPhysics.
+
+        CharacterManager runs the same steps for many characters at once:
+        beginUpdate, then the movement state (processState, or jumpTo and
+        fallTo for arcs it works out itself), then finishUpdate.
         """
-        processStates = {
-            "ground": self.__processGround,
-            "jumping": self.__processJumping,
-            "falling": self.__processFalling,
-            "flying": self.__processFlying,
-        }
+        if self.telemetry is None:
+            self.beginUpdate(timestep)
+            self.processState()
+            self.finishUpdate()
+            return
 
+        # Run on its own every update is a frame, CharacterManager advances
+        # the frame once a pass instead
+        self.telemetry.frame += 1
+        start = time.perf_counter()
+        self.beginUpdate(timestep)
+        self.processState()
+        self.finishUpdate()
+        self.__log(UPDATE, time.perf_counter() - start)
+
+    def beginUpdate(self, timestep=None):
         if timestep is None:
             self.__timeStep = globalClock.getDt()
         else:
             self.__timeStep = timestep
 
-        self.__updateFootContact()
-        self.__updateHeadContact()
+        self.__readPosition()
+        self.__updateContacts()
 
-        processStates[self.movementState]()
+    def processState(self):
+        self.__processStates[self.movementState]()
+
+    def finishUpdate(self, penetration=None):
+        """
+        penetration -- how far to push the character out of whatever it's
+        inside of, found with a contact test if not given.  Not used when
+        sweepMovement is on, or when the character was put somewhere new
+        since the last step.
+        """
+        # The probes are done, the world steps after this and puts the
+        # capsule where we leave it.  Until then its contacts are from
+        # where it was before being moved, nothing to push us out of.
+        stale = self.__capsuleStale
+        self.__capsuleStale = False
 
         self.__applyLinearVelocity()
-        self.__preventPenetration()
+
+        if not self.sweepMovement and not stale:
+            if penetration is None:
+                penetration = self.__penetration()
+            self.__pos.x += penetration.x
+            self.__pos.y += penetration.y
+
+            if self.telemetry is not None and (penetration.x or penetration.y):
+                self.__log(PENETRATION, math.hypot(penetration.x, penetration.y))
 
         self.__updateCapsule()
 
         if self.isCrouching and not self.__enabledCrouch:
             self.__standUp()
 
+    def destroy(self):
+        # The capsule goes with the game object, the ghost is ours to remove
+        if self.isCrouching:
+            self.__world.remove(self.__crouchGhost)
+        else:
+            self.__world.remove(self.__walkGhost)
+
+        self.__walkGhost.clearPythonTag("character")
+        self.__crouchGhost.clearPythonTag("character")
+        self.movementParent.removeNode()
+
+    def __log(self, kind, value=0.0):
+        pos = self.__pos
+        self.telemetry.record(kind, self.game_object.id, STATE_CODES[self.movementState], value,
+                              pos.x, pos.y, pos.z)
+
     def __land(self):
         self.movementState = "ground"
-        print("new state", self.movementState)
+
+        if self.telemetry is not None:
+            self.__log(STATE)
 
     def __fall(self):
         self.movementState = "falling"
 
-        self.__fallStartPos = self.__currentPos.z
+        self.__fallStartPos = self.__pos.z
         self.fallDelta = 0.0
         self.__fallTime = 0.0
 
-        print("new state", self.movementState)
+        if self.telemetry is not None:
+            self.__log(STATE)
 
     def __jump(self, maxZ=3.0):
         if "jumping" not in self.movementStateFilter[self.movementState]:
             return
 
-        maxZ += self.__currentPos.z
+        maxZ += self.__pos.z
+
+        # The head probe only looks as far up as the character needs
+        # while moving, look further for the whole height of the jump
+        if self.__intelligentJump and self.__headNode is None:
+            self.__updateHeadContact(maxZ + self.__h - self.__pos.z)
 
-        if self.__intelligentJump and self.__headContact is not None and self.__headContact[0].z < maxZ + self.__h:
-            maxZ = self.__headContact[0].z - self.__h * 1.2
+        if self.__intelligentJump and self.__headNode is not None and self.__headPos.z < maxZ + self.__h:
+            maxZ = self.__headPos.z - self.__h * 1.2
 
         maxZ = round(maxZ, 2)
 
-        self.jumpStartPos = self.__currentPos.z
+        self.jumpStartPos = self.__pos.z
         self.jumpTime = 0.0
 
         bsq = -4.0 * self.gravity * (maxZ - self.jumpStartPos)
@@ -262,15 +448,24 @@ class PandaBulletCharacterController:
 
         self.movementState = "jumping"
 
+        if self.telemetry is not None:
+            self.__log(STATE)
+
     def __standUp(self):
-        self.__updateHeadContact()
+        self.__updateHeadContact(self.__walkH)
 
-        if self.__headContact is not None and self.__currentPos.z + self.__walkLevitation + self.__walkCapsuleH >= \
-                self.__headContact[0].z:
+        if self.__headNode is not None and self.__pos.z + self.__walkLevitation + self.__walkCapsuleH >= \
+                self.__headPos.z:
             return
 
         self.isCrouching = False
 
+        self.__useWalkCapsule()
+
+        if self.__standUpCallback[0] is not None:
+            self.__standUpCallback(*self.__standUpCallback[1], **self.__standUpCallback[2])
+
+    def __useWalkCapsule(self):
         self.capsule = self.__walkCapsule
         self.capsuleNP = self.__walkCapsuleNP
 
@@ -278,63 +473,119 @@ class PandaBulletCharacterController:
 
         self.__world.removeRigidBody(self.__crouchCapsuleNP.node())
         self.__world.attachRigidBody(self.__walkCapsuleNP.node())
+        self.__world.remove(self.__crouchGhost)
+        self.__world.attach(self.__walkGhost)
         # Let the player know its new physics objejct
         self.game_object.physics = self.__walkCapsuleNP.node()
 
         self.__capsuleOffset = self.__capsuleH * 0.5 + self.__levitation
         self.__footDistance = self.__capsuleOffset + self.__levitation
-
-        if self.__standUpCallback[0] is not None:
-            self.__standUpCallback(*self.__standUpCallback[1], **self.__standUpCallback[2])
+        self.__probesValid = False
+        self.__capsuleStale = True
 
     def __processGround(self):
         if not self.isOnGround():
             self.__fall()
         else:
-            self.setZ(self.__footContact[0].z)
+            self.__pos.z = self.__footPos.z
+
+    @property
+    def fallTime(self):
+        return self.__fallTime
+
+    @property
+    def fallStartPos(self):
+        return self.__fallStartPos
+
+    @property
+    def timeStep(self):
+        return self.__timeStep
 
     def __processFalling(self):
-        self.__fallTime += self.__timeStep
-        self.fallDelta = self.gravity * (self.__fallTime) ** 2
+        fallTime = self.__fallTime + self.__timeStep
+        self.fallTo(fallTime, self.gravity * fallTime ** 2)
 
-        newPos = Vec3(self.__currentPos)
-        newPos.z = self.__fallStartPos + self.fallDelta
+    def fallTo(self, fallTime, fallDelta):
+        """
+        Finish a falling step fallTime into the fall, fallDelta below where
+        the fall started.
+        """
+        self.__fallTime = fallTime
+        self.fallDelta = fallDelta
+
+        z = self.__fallStartPos + self.fallDelta
 
-        self.__currentPos = newPos
+        # The foot probe only looked as far as levitation below our feet,
+        # look for a floor all the way down to where we're falling to
+        pos = self.__pos
+        sweep = self.sweepMovement and z < pos.z - self.__levitation
+        if sweep:
+            self.__updateFootContact(self.__capsuleOffset + pos.z - z)
+
+        pos.z = z
 
         if self.isOnGround():
+            if sweep:
+                pos.z = self.__footPos.z
             self.__land()
             if self.__fallCallback[0] is not None:
                 self.__fallCallback(self.__fallStartPos, *self.__fallCallback[1], **self.__fallCallback[2])
 
     def __processJumping(self):
-        if self.__headContact is not None and self.__capsuleTop >= self.__headContact[0].z:
-            # This shouldn't happen, but just in case, if we hit the ceiling, we start to fall
-            print("Head bang")
-            self.__fall()
+        if self.hitCeiling():
             return
 
-        oldPos = float(self.__currentPos.z)
+        jumpTime = self.jumpTime + self.__timeStep
+        self.jumpTo(jumpTime, (self.gravity * jumpTime ** 2) + (self.jumpSpeed * jumpTime) + self.jumpStartPos)
 
-        self.jumpTime += self.__timeStep
+    def hitCeiling(self):
+        if self.__headNode is not None and self.__capsuleTop >= self.__headPos.z:
+            # This shouldn't happen, but just in case, if we hit the ceiling, we start to fall
+            if self.telemetry is not None:
+                self.__log(CEILING, self.__headPos.z)
+            self.__fall()
+            return True
 
-        self.setZ((self.gravity * self.jumpTime ** 2) + (self.jumpSpeed * self.jumpTime) + self.jumpStartPos)
+        return False
 
-        if round(self.__currentPos.z, 2) >= self.jumpMaxHeight:
+    def jumpTo(self, jumpTime, z):
+        """
+        Finish a jumping step jumpTime into the jump, at height z.
+        """
+        self.jumpTime = jumpTime
+
+        # Same for the head probe and the top of the capsule
+        pos = self.__pos
+        if self.sweepMovement and z > pos.z:
+            top = self.__capsuleTop - pos.z
+            reach = top + z - pos.z - self.__capsuleOffset
+            if reach > self.__h:
+                self.__updateHeadContact(reach)
+
+            if self.__headNode is not None and z + top >= self.__headPos.z:
+                pos.z = self.__headPos.z - top
+                if self.telemetry is not None:
+                    self.__log(CEILING, self.__headPos.z)
+                self.__fall()
+                return
+
+        pos.z = z
+
+        if round(self.__pos.z, 2) >= self.jumpMaxHeight:
             self.__fall()
 
     def __processFlying(self):
-        if self.__footContact and self.__currentPos.z - 0.1 < self.__footContact[0].z and self.__linearVelocity.z < 0.0:
-            self.setZ(self.__footContact[0].z)
+        if self.__footNode is not None and self.__pos.z - 0.1 < self.__footPos.z and self.__linearVelocity.z < 0.0:
+            self.__pos.z = self.__footPos.z
             self.__linearVelocity.z = 0.0
 
-        if self.__headContact and self.__capsuleTop >= self.__headContact[0].z and self.__linearVelocity.z > 0.0:
+        if self.__headNode is not None and self.__capsuleTop >= self.__headPos.z and self.__linearVelocity.z > 0.0:
             self.__linearVelocity.z = 0.0
 
     def __checkFutureSpace(self, globalVel):
         globalVel = globalVel * self.futureSpacePredictionDistance
 
-        pFrom = Point3(self.capsuleNP.getPos(render) + globalVel)
+        pFrom = Point3(self.capsuleNP.getPos(self.__parent) + globalVel)
         pUp = Point3(pFrom + Point3(0, 0, self.__capsuleH * 2.0))
         pDown = Point3(pFrom - Point3(0, 0, self.__capsuleH * 2.0 + self.__levitation))
 
@@ -355,69 +606,112 @@ class PandaBulletCharacterController:
 
         return True
 
-    def __updateFootContact(self):
-        pFrom = Point3(self.capsuleNP.getPos(render))
-        pTo = Point3(pFrom - Point3(0, 0, self.__footDistance))
-        result = self.__world.rayTestAll(pFrom, pTo)
-
-        if not result.hasHits():
-            self.__footContact = None
+    def __updateContacts(self):
+        pos = self.__pos
+
+        # Reuse the last probes if we haven't moved (give or take float
+        # noise from snapping to the ground), stand on something that
+        # can't move and nothing above us can move either
+        if self.movementState == "ground" and self.__probesValid and self.__probeAge < self.probeReuseFrames \
+                and pos.almostEqual(self.__probePos, 1e-4) \
+                and self.__footNode is not None and self.__footNode.isStatic() \
+                and (self.__headNode is None or self.__headNode.isStatic()):
+            self.__probeAge += 1
+            self.reusedProbes += 2
             return
 
-        sorted_hits = sorted(result.getHits(), key=lambda hit: (pFrom - hit.getHitPos()).length())
+        self.__updateFootContact()
+        self.__updateHeadContact()
 
-        for hit in sorted_hits:
-            if type(hit.getNode()) is BulletGhostNode:
-                continue
+        self.__probePos.set(pos.x, pos.y, pos.z)
+        self.__probesValid = True
+        self.__probeAge = 0
+
+    def __probe(self, distance):
+        # Straight up or down from the middle of the capsule
+        pos = self.__pos
+        z = pos.z + self.__capsuleOffset
+        self.__rayFrom.set(pos.x, pos.y, z)
+        self.__rayTo.set(pos.x, pos.y, z + distance)
+        self.rayTests += 1
+
+        if not self.__capsuleStale:
+            return self.__world.rayTestClosest(self.__rayFrom, self.__rayTo, PROBE_MASK)
+
+        # Same as __sweep, our capsule only collides like a ghost meanwhile
+        node = self.capsuleNP.node()
+        mask = node.getIntoCollideMask()
+        node.setIntoCollideMask(GHOST_MASK)
+        result = self.__world.rayTestClosest(self.__rayFrom, self.__rayTo, PROBE_MASK)
+        node.setIntoCollideMask(mask)
+        return result
+
+    def __updateFootContact(self, distance=None):
+        # Down to levitation below our feet, see fallTo for further
+        if distance is None:
+            distance = self.__footDistance
+
+        result = self.__probe(-distance)
+        node = result.getNode() if result.hasHit() else None
+
+        if self.telemetry is not None and node != self.__footNode:
+            self.__log(FOOT, result.getHitPos().z if node is not None else math.nan)
+
+        self.__footNode = node
+        if node is None:
+            return
 
-            self.__footContact = [hit.getHitPos(), hit.getNode(), hit.getHitNormal()]
-            break
+        self.__footPos.assign(result.getHitPos())
+        self.__footNormal.assign(result.getHitNormal())
 
-    def __updateHeadContact(self):
-        pFrom = Point3(self.capsuleNP.getPos(render))
-        pTo = Point3(pFrom + Point3(0, 0, self.__capsuleH * 20.0))
-        result = self.__world.rayTestAll(pFrom, pTo)
+    def __updateHeadContact(self, distance=None):
+        # Far enough to see a ceiling over the top of the capsule, see
+        # __jump for the longer look taken when jumping
+        if distance is None:
+            distance = self.__h
 
-        if not result.hasHits():
-            self.__headContact = None
-            return
+        result = self.__probe(distance)
+        node = result.getNode() if result.hasHit() else None
 
-        sorted_hits = sorted(result.getHits(), key=lambda hit: (pFrom - hit.getHitPos()).length())
+        if self.telemetry is not None and node != self.__headNode:
+            self.__log(HEAD, result.getHitPos().z if node is not None else math.nan)
 
-        for hit in sorted_hits:
-            if type(hit.getNode()) is BulletGhostNode:
-                continue
+        self.__headNode = node
+        if node is None:
+            return
 
-            self.__headContact = [hit.getHitPos(), hit.getNode()]
-            break
+        self.__headPos.assign(result.getHitPos())
 
     def __updateCapsule(self):
-        self.movementParent.setPos(self.__currentPos)
+        pos = self.__pos
+        self.movementParent.setPos(pos)
         self.capsuleNP.setPos(0, 0, self.__capsuleOffset)
-        self.game_object.position = self.__currentPos
+        self.__writePosition()
 
-        self.__capsuleTop = self.__currentPos.z + self.__levitation + self.__capsuleH * 2.0
+        self.__capsuleTop = pos.z + self.__levitation + self.__capsuleH * 2.0
 
     def __applyLinearVelocity(self):
-        globalVel = self.movementParent.getQuat(render).xform(self.__linearVelocity) * self.__timeStep
+        # The movement parent only ever turns about z, so rotate the
+        # velocity by its heading rather than going through a quaternion
+        h = math.radians(self.movementParent.getH())
+        c = math.cos(h) * self.__timeStep
+        s = math.sin(h) * self.__timeStep
+        velocity = self.__linearVelocity
+        globalVel = self.__globalVel
+        globalVel.set(velocity.x * c - velocity.y * s, velocity.x * s + velocity.y * c,
+                      velocity.z * self.__timeStep)
 
         if self.predictFutureSpace and not self.__checkFutureSpace(globalVel):
             return
 
-        if self.__footContact is not None and self.minSlopeDot and self.movementState != "flying":
-            normalVel = Vec3(globalVel)
-            normalVel.normalize()
-
-            floorNormal = self.__footContact[2]
-            absSlopeDot = round(floorNormal.dot(Vec3.up()), 2)
-
-            def applyGravity():
-                self.__currentPos -= Vec3(floorNormal.x, floorNormal.y, 0.0) * self.gravity * self.__timeStep * 0.1
+        if self.__footNode is not None and self.minSlopeDot and self.movementState != "flying":
+            floorNormal = self.__footNormal
+            absSlopeDot = round(floorNormal.dot(UP), 2)
 
             if absSlopeDot <= self.minSlopeDot:
-                applyGravity()
+                self.__slideDownSlope(floorNormal)
 
-                if globalVel != Vec3():
+                if globalVel != ZERO:
                     globalVelDir = Vec3(globalVel)
                     globalVelDir.normalize()
 
@@ -426,17 +720,73 @@ class PandaBulletCharacterController:
 
                     velDot = 1.0 - globalVelDir.angleDeg(fn) / 180.0
                     if velDot < 0.5:
-                        self.__currentPos -= Vec3(fn.x * globalVel.x, fn.y * globalVel.y, 0.0) * velDot
+                        self.__pos -= Vec3(fn.x * globalVel.x, fn.y * globalVel.y, 0.0) * velDot
 
                     globalVel *= velDot
 
-            elif self.__slopeAffectsSpeed and globalVel != Vec3():
-                applyGravity()
+            elif self.__slopeAffectsSpeed and globalVel != ZERO:
+                self.__slideDownSlope(floorNormal)
+
+        if self.sweepMovement:
+            self.__sweep(globalVel)
+        else:
+            self.__pos += globalVel
+
+    def __slideDownSlope(self, floorNormal):
+        slide = self.gravity * self.__timeStep * 0.1
+        self.__pos.x -= floorNormal.x * slide
+        self.__pos.y -= floorNormal.y * slide
 
-        self.__currentPos += globalVel
+    def __sweep(self, move):
+        # Keep this far away from what we hit so the next sweep doesn't start touching it
+        margin = 0.01
 
-    def __preventPenetration(self):
-        collisions = Vec3()
+        pos = self.__pos
+        center = Point3(pos.x, pos.y, pos.z + self.__capsuleOffset)
+        remaining = Vec3(move)
+
+        # The capsule would be the first thing its own sweep hits, so it
+        # only collides like a ghost while sweeping
+        node = self.capsuleNP.node()
+        mask = node.getIntoCollideMask()
+        node.setIntoCollideMask(GHOST_MASK)
+
+        for i in range(self.maxSweeps):
+            length = remaining.length()
+            if length < 1e-6:
+                break
+
+            target = center + remaining
+            result = self.__world.sweepTestClosest(self.capsule, TransformState.makePos(center),
+                                                   TransformState.makePos(target), PROBE_MASK, 0.0)
+            self.sweepTests += 1
+
+            if not result.hasHit():
+                center = target
+                break
+
+            fraction = max(result.getHitFraction() - margin / length, 0.0)
+            center += remaining * fraction
+            remaining *= 1.0 - fraction
+
+            # Slide along what we hit with what's left.  Walking slides
+            # sideways only, up and down is up to the foot and head probes.
+            normal = Vec3(result.getHitNormal())
+            if self.movementState != "flying" and (normal.x or normal.y):
+                normal.z = 0.0
+            normal.normalize()
+
+            into = remaining.dot(normal)
+            if into < 0.0:
+                remaining -= normal * into
+
+        node.setIntoCollideMask(mask)
+
+        pos.set(center.x, center.y, center.z - self.__capsuleOffset)
+
+    def __penetration(self):
+        collisions = self.__push
+        collisions.set(0, 0, 0)
 
         ##########################################################
         # This is a hacky version for when contactTest didn't work
@@ -466,8 +816,7 @@ class PandaBulletCharacterController:
             if mpoint.getDistance() < 0:
                 collisions -= normal * mpoint.getDistance()
 
-        collisions.z = 0.0
-        self.__currentPos += collisions
+        return collisions
 
     def __mapMethods(self):
         self.getQuat = self.movementParent.getQuat
@@ -504,21 +853,26 @@ class PandaBulletCharacterController:
     def getZ(self):
         return self.game_object.position[2]
 
+    def __movedTo(self, pos):
+        self.__capsuleStale = True
+        self.__pos.set(pos.x, pos.y, pos.z)
+        self.__writePosition()
+
     def setPos(self, *args):
         self.movementParent.setPos(*args)
-        self.__currentPos = self.movementParent.getPos(render)
+        self.__movedTo(self.movementParent.getPos(self.__parent))
 
     def setX(self, *args):
         self.movementParent.setX(*args)
-        self.__currentPos = self.movementParent.getPos(render)
+        self.__movedTo(self.movementParent.getPos(self.__parent))
 
     def setY(self, *args):
         self.movementParent.setY(*args)
-        self.__currentPos = self.movementParent.getPos(render)
+        self.__movedTo(self.movementParent.getPos(self.__parent))
 
     def setZ(self, *args):
         self.movementParent.setZ(*args)
-        self.__currentPos = self.movementParent.getPos(render)
+        self.__movedTo(self.movementParent.getPos(self.__parent))
 
     def __setup(self, walkH, crouchH, stepH, R):
         def setData(fullH, stepH, R):
@@ -555,9 +909,14 @@ class PandaBulletCharacterController:
         self.__walkCapsuleNP.setCollideMask(BitMask32.allOn())
         self.__world.attachRigidBody(self.__walkCapsuleNP.node())
 
+        # The ghost rides along with the capsule so Bullet keeps contact
+        # manifolds for it against static geometry, which it doesn't do
+        # for the kinematic capsule itself
         self.__walkGhost = BulletGhostNode('walkGhost')
+        self.__walkGhost.setPythonTag("character", self)
         self.__walkGhost.addShape(self.__walkCapsule)
-        self.__walkGhostNP = self.movementParent.attachNewNode(self.__walkGhost)
+        self.__walkGhostNP = self.__walkCapsuleNP.attachNewNode(self.__walkGhost)
+        self.__walkGhostNP.setCollideMask(GHOST_MASK)
         self.__world.attach(self.__walkGhost)
 
         # Crouch Capsule
@@ -568,6 +927,12 @@ class PandaBulletCharacterController:
         self.__crouchCapsuleNP.node().setKinematic(True)
         self.__crouchCapsuleNP.setCollideMask(BitMask32.allOn())
 
+        self.__crouchGhost = BulletGhostNode('crouchGhost')
+        self.__crouchGhost.setPythonTag("character", self)
+        self.__crouchGhost.addShape(self.__crouchCapsule)
+        self.__crouchGhostNP = self.__crouchCapsuleNP.attachNewNode(self.__crouchGhost)
+        self.__crouchGhostNP.setCollideMask(GHOST_MASK)
+
         # Set default
         self.capsule = self.__walkCapsule
         self.capsuleNP = self.__walkCapsuleNP
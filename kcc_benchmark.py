@@ -0,0 +1,198 @@
+import math
+import statistics
+import time
+import tracemalloc
+
+from panda3d.core import Vec3
+
+from game_object import GameObject
+from headless import HeadlessGame
+from kcc_telemetry import Telemetry
+
+
+class WallCourse:
+    """
+    A floor with a thin wall across it, to see whether the character stops
+    at the wall or ends up on the other side.
+    """
+
+    def __init__(self, game_world, thickness=0.2):
+        self.game_world = game_world
+        self.thickness = thickness
+
+    def build(self):
+        self.game_world.create_object((10, 0, -0.5), "floor", [30.0, 10.0, 1.0], 0, GameObject)
+        self.game_world.create_object((6, 0, 1.5), "red box", [self.thickness, 10.0, 3.0], 0, GameObject)
+
+
+class ThinFloorCourse:
+    """
+    A thin platform with nothing under it, to see whether a character
+    falling onto it lands or drops straight through.
+    """
+
+    def __init__(self, game_world, thickness=0.1):
+        self.game_world = game_world
+        self.thickness = thickness
+
+    def build(self):
+        self.game_world.create_object((0, 0, -self.thickness / 2), "floor", [10.0, 10.0, self.thickness], 0,
+                                      GameObject)
+
+
+def run_course(sweep, frames=900):
+    """
+    Run down the obstacle course jumping every 1.5 seconds, returning the
+    time per frame in ms and where the player ended up.
+    """
+    game = HeadlessGame()
+    game.player.sweepMovement = sweep
+    game.set_heading(-90.0)
+
+    elapsed = 0.0
+    for i in range(frames):
+        events = ('jump',) if i % 90 == 0 else ()
+        start = time.perf_counter()
+        game.step(events, ('moveForward',))
+        elapsed += time.perf_counter() - start
+
+    return elapsed / frames * 1000.0, game.player.getPos()
+
+
+def run_into_wall(sweep, speed, step_size=1.0 / 60.0, frames=120):
+    """
+    Run at the wall and return whether the character came out the far side.
+    """
+    # A runner rather than the player, so it isn't held to the input's speed
+    game = HeadlessGame(step_size=step_size, course=WallCourse)
+    runner, = game.characters.spawn([(0, 0, 0.5)])
+    runner.sweepMovement = sweep
+    runner.setH(-90.0)
+    runner.setLinearMovement(Vec3(0, speed, 0))
+
+    for _ in range(frames):
+        game.step()
+
+    return runner.getX() > 6.0
+
+
+def fall_onto_floor(sweep, height, step_size=1.0 / 60.0):
+    """
+    Drop from height onto the thin platform and return whether the
+    character fell through it.
+    """
+    game = HeadlessGame(step_size=step_size, course=ThinFloorCourse)
+    runner, = game.characters.spawn([(0, 0, height)])
+    runner.sweepMovement = sweep
+
+    # Long enough to land from any height tried, with time to settle
+    frames = int((math.sqrt(height / abs(runner.gravity)) + 1.0) / step_size)
+    for _ in range(frames):
+        game.step()
+
+    return runner.getZ() < -0.5
+
+
+def update_cost(moving=True, telemetry=False, frames=600):
+    """
+    Median time in microseconds and peak memory allocated in bytes per
+    call of the player's update, either running down the course or
+    standing still, with or without recording telemetry.  The world is
+    ticked in between but not counted.
+    """
+    speed = Vec3(0, 5.0 if moving else 0.0, 0)
+
+    def run(measure):
+        game = HeadlessGame()
+        player = game.player
+        if telemetry:
+            player.telemetry = Telemetry()
+        player.setH(-90.0)
+        dt = game.step_size
+
+        # Land on the starting platform first
+        for _ in range(60):
+            game.step()
+
+        costs = []
+        for _ in range(frames):
+            player.setLinearMovement(speed)
+            costs.append(measure(player, dt))
+            game.game_world.tick(dt)
+
+        # The median, one slow frame from the rest of the machine shouldn't
+        # swamp a difference of a microsecond or two
+        return statistics.median(costs)
+
+    def timed(player, dt):
+        start = time.perf_counter()
+        player.update(dt)
+        return time.perf_counter() - start
+
+    def allocated(player, dt):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        player.update(dt)
+        return tracemalloc.get_traced_memory()[1] - before
+
+    # Timed separately, tracing allocations slows everything down
+    seconds = run(timed)
+
+    tracemalloc.start()
+    try:
+        peak = run(allocated)
+    finally:
+        tracemalloc.stop()
+
+    return seconds * 1e6, peak
+
+
+def telemetry_cost(frames=2000):
+    """
+    How many microseconds recording telemetry adds to the player's update.
+    The player stands still with telemetry switched on every other frame,
+    so both halves are timed in the same game under the same conditions.
+    """
+    game = HeadlessGame()
+    player = game.player
+    telemetry = Telemetry()
+    dt = game.step_size
+
+    for _ in range(60):
+        game.step()
+
+    costs = ([], [])
+    for frame in range(frames):
+        on = frame % 2
+        player.telemetry = telemetry if on else None
+        start = time.perf_counter()
+        player.update(dt)
+        costs[on].append(time.perf_counter() - start)
+        game.game_world.tick(dt)
+
+    return (statistics.median(costs[1]) - statistics.median(costs[0])) * 1e6
+
+
+if __name__ == '__main__':
+    for telemetry in (False, True):
+        for moving in (False, True):
+            us, peak = update_cost(moving, telemetry)
+            print(f"update {'running' if moving else 'standing'}{' with telemetry' if telemetry else ''}: "
+                  f"{us:.1f} us, {peak:.0f} bytes allocated at peak")
+
+    print(f"telemetry adds {telemetry_cost():.1f} us per update")
+
+    for sweep in (False, True):
+        mode = 'sweep' if sweep else 'push'
+        ms, position = run_course(sweep)
+        print(f"{mode:5} course: {ms:.3f} ms per frame, ended at {position}")
+
+    for step_size, speed in ((1.0 / 60.0, 5.0), (1.0 / 60.0, 30.0), (1.0 / 15.0, 5.0), (1.0 / 15.0, 20.0)):
+        results = ["tunnelled" if run_into_wall(sweep, speed, step_size) else "stopped"
+                   for sweep in (False, True)]
+        print(f"{1.0 / step_size:3.0f} Hz at speed {speed:4.1f}: push {results[0]}, sweep {results[1]}")
+
+    for step_size, height in ((1.0 / 60.0, 20.0), (1.0 / 60.0, 200.0), (1.0 / 15.0, 20.0), (1.0 / 15.0, 60.0)):
+        results = ["fell through" if fall_onto_floor(sweep, height, step_size) else "landed"
+                   for sweep in (False, True)]
+        print(f"{1.0 / step_size:3.0f} Hz falling {height:5.1f}: push {results[0]}, sweep {results[1]}")
@@ -0,0 +1,145 @@
+import csv
+import json
+import struct
+
+import numpy as np
+
+# What happened, the kind of each event
+STATE, FOOT, HEAD, CEILING, PENETRATION, UPDATE = range(6)
+KINDS = ('state', 'foot', 'head', 'ceiling', 'penetration', 'update')
+
+# The character's movement state when the event was recorded
+STATES = ('ground', 'jumping', 'falling', 'flying')
+STATE_CODES = {name: code for code, name in enumerate(STATES)}
+
+# One event, packed.  value depends on the kind:
+#
+#   state        0, the new state is in state
+#   foot, head   the height of the new contact, nan if there is none
+#   ceiling      the height of the ceiling we hit
+#   penetration  how far the character was pushed out of something
+#   update       how long the update took in seconds
+#
+# character is the game object's id, -1 for a CharacterManager pass, and
+# x, y, z is where the character was.
+RECORD = struct.Struct('<IiBBffff')
+EVENT = np.dtype([
+    ('frame', '<u4'),
+    ('character', '<i4'),
+    ('kind', 'u1'),
+    ('state', 'u1'),
+    ('value', '<f4'),
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('z', '<f4'),
+])
+
+# Saved like an input log, a small header followed by the events
+#
+#   magic (4 bytes) | version (uint32) | header length (uint32) | header (JSON) | events
+MAGIC = b'CPKT'
+VERSION = 1
+PREFIX = struct.Struct('<4sII')
+
+
+class Telemetry:
+    """
+    Keeps the last capacity events from character controllers, oldest
+    overwritten first.  Recording an event packs it straight into a
+    buffer allocated up front, so it can be left on in long sessions and
+    saved when something odd happens.
+
+    Give it to a controller through its telemetry attribute, whose update
+    advances frame, or to CharacterManager which advances frame once a
+    pass for all its controllers.
+    """
+
+    def __init__(self, capacity=1 << 16):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity * RECORD.size)
+        self.events = np.frombuffer(self.buffer, dtype=EVENT)
+
+        # Every event ever recorded, including ones since overwritten
+        self.count = 0
+        self.frame = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def dropped(self):
+        return max(self.count - self.capacity, 0)
+
+    def record(self, kind, character, state, value, x, y, z):
+        RECORD.pack_into(self.buffer, (self.count % self.capacity) * RECORD.size,
+                         self.frame, character, kind, state, value, x, y, z)
+        self.count += 1
+
+    def latest(self):
+        """
+        A copy of the events still in the buffer, oldest first.
+        """
+        if self.count <= self.capacity:
+            return self.events[:self.count].copy()
+
+        start = self.count % self.capacity
+        return np.concatenate((self.events[start:], self.events[:start]))
+
+    def clear(self):
+        self.count = 0
+
+    def save(self, filename):
+        """
+        Save the events in the buffer, as CSV if filename ends in .csv.
+        """
+        events = self.latest()
+
+        if filename.endswith('.csv'):
+            with open(filename, 'w', newline='') as outfile:
+                writer = csv.writer(outfile)
+                writer.writerow(EVENT.names)
+                for frame, character, kind, state, value, x, y, z in events.tolist():
+                    writer.writerow((frame, character, KINDS[kind], STATES[state], value, x, y, z))
+            return
+
+        header = json.dumps({'count': len(events), 'dropped': self.dropped, 'kinds': KINDS,
+                             'states': STATES}).encode()
+        header += b' ' * (-(PREFIX.size + len(header)) % 8)
+
+        with open(filename, 'wb') as outfile:
+            outfile.write(PREFIX.pack(MAGIC, VERSION, len(header)))
+            outfile.write(header)
+            outfile.write(events.tobytes())
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as infile:
+            magic, version, header_length = PREFIX.unpack(infile.read(PREFIX.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{filename} is not a telemetry file")
+
+            header = json.loads(infile.read(header_length))
+            events = np.frombuffer(infile.read(), dtype=EVENT, count=header['count'])
+
+        telemetry = cls(max(len(events), 1))
+        telemetry.events[:len(events)] = events
+        telemetry.count = len(events)
+        return telemetry
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2:
+        print("usage: kcc_telemetry.py telemetry.bin [out.csv]")
+        sys.exit(1)
+
+    telemetry = Telemetry.load(sys.argv[1])
+    events = telemetry.latest()
+
+    if len(sys.argv) > 2:
+        telemetry.save(sys.argv[2])
+        print(f"Wrote {len(events)} events to {sys.argv[2]}")
+
+    for code, name in enumerate(KINDS):
+        print(f"{name:12} {np.count_nonzero(events['kind'] == code)}")
@@ -0,0 +1,304 @@
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+# A compiled level is a small header followed by one fixed size record per
+# object, so it can be memory mapped and read column by column.
+#
+#   magic (4 bytes) | version (uint32) | header length (uint32) | header (JSON) | records
+#
+# The header holds the source file's hash, the object count, the string
+# tables that the kind and class columns index into and any stable keys.
+MAGIC = b'CPLV'
+VERSION = 2
+PREFIX = struct.Struct('<4sII')
+
+RECORD = np.dtype([
+    ('position', '<f8', 3),
+    ('size', '<f8', 4),
+    ('size_len', 'u1'),
+    ('mass', '<f8'),
+    ('kind', '<u2'),
+    ('class', '<u2'),
+    ('collision_source', 'u1'),
+])
+
+CACHE_DIR = '.cache'
+
+
+class Level:
+    """
+    The objects in a level as parallel lists, ready to hand to create_object.
+    """
+
+    def __init__(self, positions, kinds, sizes, masses, classes, collision_sources, keys=None):
+        self.positions = positions
+        self.kinds = kinds
+        self.sizes = sizes
+        self.masses = masses
+        self.classes = classes
+        self.collision_sources = collision_sources
+
+        # The optional "key" of each object, None where it wasn't given
+        self.keys = keys if keys is not None else [None] * len(positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+    @classmethod
+    def from_json(cls, level_data):
+        objects = level_data['objects']
+        return cls([list(obj['position']) for obj in objects],
+                   [obj['kind'] for obj in objects],
+                   [list(obj['size']) for obj in objects],
+                   [obj['mass'] for obj in objects],
+                   [obj['class'] for obj in objects],
+                   [bool(obj.get('collision_source', False)) for obj in objects],
+                   [obj.get('key') for obj in objects])
+
+    @classmethod
+    def from_records(cls, records, kinds, classes, keys=None):
+        # tolist() turns each column into plain Python values in one call
+        size_lens = records['size_len'].tolist()
+        return cls(records['position'].tolist(),
+                   [kinds[kind] for kind in records['kind'].tolist()],
+                   [size[:length] for size, length in zip(records['size'].tolist(), size_lens)],
+                   records['mass'].tolist(),
+                   [classes[c] for c in records['class'].tolist()],
+                   [bool(source) for source in records['collision_source'].tolist()],
+                   keys)
+
+    def to_json(self):
+        objects = []
+        for position, kind, size, mass, class_name, collision_source, key in zip(
+                self.positions, self.kinds, self.sizes, self.masses, self.classes, self.collision_sources, self.keys):
+            obj = {'kind': kind, 'position': list(position), 'size': list(size), 'mass': mass, 'class': class_name}
+            if collision_source:
+                obj['collision_source'] = True
+            if key is not None:
+                obj['key'] = key
+            objects.append(obj)
+
+        return {'objects': objects}
+
+    def entries(self):
+        """
+        Everything each object is made from as a tuple that can be compared
+        between loads: position, kind, size, mass, class and whether it's a
+        collision source.
+        """
+        return [(tuple(position), kind, tuple(size), mass, class_name, collision_source)
+                for position, kind, size, mass, class_name, collision_source in zip(
+                    self.positions, self.kinds, self.sizes, self.masses, self.classes, self.collision_sources)]
+
+    def stable_keys(self, previous=None):
+        """
+        A key for each object that stays the same when the level is edited,
+        so reloads can match objects up.
+
+        previous -- the entries of the last load by key, see entries
+
+        Objects without a "key" in the file take the key of an identical
+        object from the last load.  Any left over take the last load's
+        remaining keys for the same class and kind in order, and after
+        that new keys made of class, kind and a count.
+        """
+        keys = list(self.keys)
+        entries = self.entries()
+        previous = previous or {}
+
+        # Keys given in the file are never handed to anything else
+        used = {key for key in keys if key is not None}
+
+        by_entry = {}
+        for key, entry in previous.items():
+            if key not in used:
+                by_entry.setdefault(entry, []).append(key)
+
+        unmatched = []
+        for index, (key, entry) in enumerate(zip(keys, entries)):
+            if key is None:
+                matches = by_entry.get(entry)
+                if matches:
+                    keys[index] = matches.pop(0)
+                    used.add(keys[index])
+                else:
+                    unmatched.append(index)
+
+        remaining = {}
+        for key, entry in previous.items():
+            if key not in used:
+                remaining.setdefault((entry[4], entry[1]), []).append(key)
+
+        counts = {}
+        for index in unmatched:
+            group = (self.classes[index], self.kinds[index])
+            left = remaining.get(group)
+            if left:
+                key = left.pop(0)
+            else:
+                count = counts.get(group, 0)
+                while (group[0], group[1], count) in used:
+                    count += 1
+                counts[group] = count + 1
+                key = (group[0], group[1], count)
+
+            keys[index] = key
+            used.add(key)
+
+        return keys
+
+
+class LevelRecorder:
+    """
+    Stands in for a GameWorld when building a course with ObstacleCourse
+    and friends, collecting what they create into a Level instead.
+    """
+
+    class RecordedObject:
+        def __init__(self, recorder, index):
+            self.recorder = recorder
+            self.index = index
+
+        @property
+        def is_collision_source(self):
+            return self.recorder.level.collision_sources[self.index]
+
+        @is_collision_source.setter
+        def is_collision_source(self, value):
+            self.recorder.level.collision_sources[self.index] = value
+
+    def __init__(self):
+        self.level = Level([], [], [], [], [], [])
+
+    def create_object(self, position, kind, size, mass, subclass):
+        level = self.level
+        level.positions.append(list(position))
+        level.kinds.append(kind)
+        level.sizes.append(list(size))
+        level.masses.append(mass)
+        level.classes.append(subclass.__name__)
+        level.collision_sources.append(False)
+        level.keys.append(None)
+        return self.RecordedObject(self, len(level.positions) - 1)
+
+    def truncate(self, count):
+        """
+        Forget everything created after the first count objects.
+        """
+        level = self.level
+        for column in (level.positions, level.kinds, level.sizes, level.masses, level.classes,
+                       level.collision_sources, level.keys):
+            del column[count:]
+
+
+def save_level(level, filename):
+    with open(filename, 'w') as outfile:
+        json.dump(level.to_json(), outfile)
+
+
+def source_hash(filename):
+    with open(filename, 'rb') as infile:
+        return hashlib.sha1(infile.read()).hexdigest()
+
+
+def cache_path(filename, digest):
+    directory, name = os.path.split(filename)
+    return os.path.join(directory, CACHE_DIR, f"{name}.{digest[:16]}.lvlc")
+
+
+def compile_level(level, digest, out_path):
+    kinds = sorted(set(level.kinds))
+    classes = sorted(set(level.classes))
+    kind_ids = {kind: i for i, kind in enumerate(kinds)}
+    class_ids = {name: i for i, name in enumerate(classes)}
+
+    records = np.zeros(len(level), dtype=RECORD)
+    records['position'] = level.positions
+    records['size'] = [list(size) + [0.0] * (4 - len(size)) for size in level.sizes]
+    records['size_len'] = [len(size) for size in level.sizes]
+    records['mass'] = level.masses
+    records['kind'] = [kind_ids[kind] for kind in level.kinds]
+    records['class'] = [class_ids[name] for name in level.classes]
+    records['collision_source'] = level.collision_sources
+
+    keys = level.keys if any(key is not None for key in level.keys) else None
+    header = json.dumps({'source': digest, 'count': len(level), 'kinds': kinds, 'classes': classes,
+                         'keys': keys}).encode()
+    # Pad so the records start 8 byte aligned
+    header += b' ' * (-(PREFIX.size + len(header)) % 8)
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+
+    # Write to a temporary name first so a half written file is never picked up
+    temp_path = out_path + '.tmp'
+    with open(temp_path, 'wb') as outfile:
+        outfile.write(PREFIX.pack(MAGIC, VERSION, len(header)))
+        outfile.write(header)
+        outfile.write(records.tobytes())
+    os.replace(temp_path, out_path)
+
+
+def read_compiled(path, digest):
+    with open(path, 'rb') as infile:
+        magic, version, header_length = PREFIX.unpack(infile.read(PREFIX.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a compiled level")
+
+        header = json.loads(infile.read(header_length))
+
+    if header['source'] != digest:
+        raise ValueError(f"{path} was compiled from a different source")
+
+    if header['count'] == 0:
+        return Level([], [], [], [], [], [])
+
+    records = np.memmap(path, dtype=RECORD, mode='r', offset=PREFIX.size + header_length, shape=(header['count'],))
+    return Level.from_records(records, header['kinds'], header['classes'], header['keys'])
+
+
+def remove_stale(filename, keep):
+    directory, name = os.path.split(filename)
+    cache_dir = os.path.join(directory, CACHE_DIR)
+    for entry in os.listdir(cache_dir):
+        if entry.startswith(name + '.') and entry.endswith('.lvlc') and os.path.join(cache_dir, entry) != keep:
+            os.remove(os.path.join(cache_dir, entry))
+
+
+def load_level(filename, use_cache=True):
+    """
+    Load a level file, going through the compiled cache next to it when
+    possible.  The cache is rebuilt whenever the JSON's contents change,
+    and if it can't be read or written the JSON is used directly.
+
+    Returns None if the level has no objects list.
+    """
+    path = None
+    if use_cache:
+        try:
+            digest = source_hash(filename)
+            path = cache_path(filename, digest)
+            if os.path.exists(path):
+                return read_compiled(path, digest)
+        except (OSError, ValueError, KeyError):
+            pass
+
+    with open(filename) as infile:
+        level_data = json.load(infile)
+
+    if not "objects" in level_data:
+        return None
+
+    level = Level.from_json(level_data)
+
+    if path:
+        try:
+            compile_level(level, digest, path)
+            remove_stale(filename, path)
+        except (OSError, ValueError):
+            pass
+
+    return level
@@ -0,0 +1,56 @@
+import os
+import time
+
+
+class LevelWatcher:
+    """
+    Calls reload_world whenever a level file changes on disk.
+
+    Call poll() every frame (or add task() to the task manager).  The file
+    is only looked at once per interval, so polling every frame is cheap.
+    region_size is passed on to reload_world.
+    """
+
+    def __init__(self, game_world, filename, interval=0.5, region_size=None):
+        self.game_world = game_world
+        self.filename = filename
+        self.interval = interval
+        self.region_size = region_size
+
+        self.last_check = time.monotonic()
+        self.last_stamp = self.stamp()
+
+    def stamp(self):
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return None
+
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self):
+        """
+        Returns True if the level was reloaded.
+        """
+        now = time.monotonic()
+        if now - self.last_check < self.interval:
+            return False
+        self.last_check = now
+
+        stamp = self.stamp()
+        if stamp is None or stamp == self.last_stamp:
+            return False
+        self.last_stamp = stamp
+
+        try:
+            self.game_world.reload_world(self.filename, self.region_size)
+        except (ValueError, KeyError) as error:
+            # Most likely caught the file half saved, try again next change
+            print(f"Couldn't reload {self.filename}: {error}")
+            return False
+
+        return True
+
+    def task(self, task):
+        self.poll()
+        return task.cont
@@ -0,0 +1,51 @@
+class ObjectPool:
+    """
+    Parks destroyed game objects so a later create_object for the same kind,
+    class and size can reuse one, physics node and view included, instead
+    of building everything from scratch.
+    """
+
+    def __init__(self, max_per_key=64):
+        self.max_per_key = max_per_key
+        self.parked = {}
+        self.parked_ids = set()
+
+    def __len__(self):
+        return len(self.parked_ids)
+
+    @staticmethod
+    def key(kind, subclass, size):
+        return kind, subclass, tuple(size)
+
+    def is_parked(self, game_object):
+        return game_object.id in self.parked_ids
+
+    def park(self, game_object):
+        """
+        Returns False if the object can't be pooled or there's no room for it.
+        """
+        if not game_object.poolable:
+            return False
+
+        objects = self.parked.setdefault(self.key(game_object.kind, type(game_object), game_object.size), [])
+        if len(objects) >= self.max_per_key:
+            return False
+
+        objects.append(game_object)
+        self.parked_ids.add(game_object.id)
+        return True
+
+    def take(self, kind, subclass, size):
+        objects = self.parked.get(self.key(kind, subclass, size))
+        if not objects:
+            return None
+
+        game_object = objects.pop()
+        self.parked_ids.discard(game_object.id)
+        return game_object
+
+    def drain(self):
+        objects = [game_object for parked in self.parked.values() for game_object in parked]
+        self.parked.clear()
+        self.parked_ids.clear()
+        return objects
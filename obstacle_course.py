@@ -0,0 +1,234 @@
+from game_object import GameObject
+from player import Player
+from teleporter import Teleporter
+
+
+class ObstacleCourse:
+    """
+    Builds the obstacle course into a GameWorld.  This is kept separate from
+    the game controller so the same course can be built with or without a window.
+    """
+
+    # The player has finished once they are past this x position
+    goal_x = 95
+
+    # The player has fallen off the course once they are below this z position
+    fall_z = -10
+
+    def __init__(self, game_world):
+        self.game_world = game_world
+
+        self.floor = None
+        self.start = None
+        self.player_obj = None
+        self.goal = None
+
+    def build(self):
+        # Create ground floor
+        floor_size = [100.0, 40.0, 1.0]
+        floor_pos = (0, 0, -0.5)
+        self.floor = self.game_world.create_object(
+            floor_pos, "floor", floor_size, 0, GameObject
+        )
+
+        # Create starting platform
+        start_size = [5.0, 5.0, 1.0]
+        start_pos = (0, 0, 0)
+        self.start = self.game_world.create_object(
+            start_pos, "floor", start_size, 0, GameObject
+        )
+
+        # Create player at start position
+        player_size = [2.0, 1.0, 0.5, 0.5]  # walkHeight, crouchHeight, stepHeight, radius
+        player_pos = (0, 0, 2)
+        self.player_obj = self.game_world.create_object(
+            player_pos, "player", player_size, 1.0, Player
+        )
+
+        # ---- OBSTACLE 1: Small jump ----
+        self.create_gap(5, 0, 2, 1)
+
+        # ---- OBSTACLE 2: Crouch under ceiling ----
+        self.create_low_ceiling(10, 0, 3, 1.5)
+
+        # ---- OBSTACLE 3: Medium jump ----
+        self.create_gap(15, 0, 3, 1)
+
+        # ---- OBSTACLE 4: Tall barrier to jump over ----
+        self.create_barrier(20, 0, 1.5, 1)
+
+        # ---- OBSTACLE 5: Two-step crouch section ----
+        self.create_crouch_tunnel(25, 0, 5, 1.2)
+
+        # ---- OBSTACLE 6: Wide gap ----
+        self.create_gap(35, 0, 4, 1)
+
+        # ---- OBSTACLE 7: Staggered blocks to climb ----
+        self.create_stair_blocks(42, 0)
+
+        # ---- OBSTACLE 8: Low then high ----
+        self.create_low_high_combo(50, 0)
+
+        # ---- OBSTACLE 9: Zigzag jump platforms ----
+        self.create_zigzag_platforms(60, 0)
+
+        # ---- OBSTACLE 10: Long crouch tunnel with varying height ----
+        self.create_variable_tunnel(70, 0, 8)
+
+        # ---- OBSTACLE 11: Teleporter trap ----
+        self.create_teleporter_trap(82, 0)
+
+        # ---- OBSTACLE 12: Final challenge - combination ----
+        self.create_final_challenge(90, 0)
+
+        # Create end goal
+        goal_size = [5.0, 5.0, 3.0]
+        goal_pos = (100, 0, 1.5)
+        self.goal = self.game_world.create_object(
+            goal_pos, "crate", goal_size, 0, GameObject
+        )
+
+    def create_gap(self, x, y, width, height):
+        """Create a gap obstacle that requires jumping"""
+        # Platform before gap
+        platform1_size = [3.0, 5.0, 1.0]
+        platform1_pos = (x - 2, y, height - 0.5)
+        self.game_world.create_object(platform1_pos, "floor", platform1_size, 0, GameObject)
+
+        # Platform after gap
+        platform2_size = [3.0, 5.0, 1.0]
+        platform2_pos = (x + width + 2, y, height - 0.5)
+        self.game_world.create_object(platform2_pos, "floor", platform2_size, 0, GameObject)
+
+    def create_low_ceiling(self, x, y, length, height):
+        """Create a low ceiling that requires crouching"""
+        # Platform below
+        platform_size = [length, 5.0, 1.0]
+        platform_pos = (x + length / 2, y, 0)
+        self.game_world.create_object(platform_pos, "floor", platform_size, 0, GameObject)
+
+        # Ceiling above
+        ceiling_size = [length, 5.0, 0.5]
+        ceiling_pos = (x + length / 2, y, height)
+        self.game_world.create_object(ceiling_pos, "floor", ceiling_size, 0, GameObject)
+
+    def create_barrier(self, x, y, height, width):
+        """Create a tall barrier to jump over"""
+        barrier_size = [width, 5.0, height]
+        barrier_pos = (x, y, height / 2)
+        self.game_world.create_object(barrier_pos, "red box", barrier_size, 0, GameObject)
+
+        # Platforms on either side
+        platform1_size = [3.0, 5.0, 1.0]
+        platform1_pos = (x - 2, y, 0)
+        self.game_world.create_object(platform1_pos, "floor", platform1_size, 0, GameObject)
+
+        platform2_size = [3.0, 5.0, 1.0]
+        platform2_pos = (x + 2, y, 0)
+        self.game_world.create_object(platform2_pos, "floor", platform2_size, 0, GameObject)
+
+    def create_crouch_tunnel(self, x, y, length, height):
+        """Create a tunnel that requires crouching for a distance"""
+        # Platform below
+        platform_size = [length, 5.0, 1.0]
+        platform_pos = (x + length / 2, y, 0)
+        self.game_world.create_object(platform_pos, "floor", platform_size, 0, GameObject)
+
+        # First ceiling section
+        ceiling1_size = [2.0, 5.0, 0.5]
+        ceiling1_pos = (x + 1, y, height)
+        self.game_world.create_object(ceiling1_pos, "floor", ceiling1_size, 0, GameObject)
+
+        # Second ceiling section - lower
+        ceiling2_size = [length - 4, 5.0, 0.5]
+        ceiling2_pos = (x + length / 2, y, height - 0.2)
+        self.game_world.create_object(ceiling2_pos, "floor", ceiling2_size, 0, GameObject)
+
+        # Third ceiling section
+        ceiling3_size = [2.0, 5.0, 0.5]
+        ceiling3_pos = (x + length - 1, y, height)
+        self.game_world.create_object(ceiling3_pos, "floor", ceiling3_size, 0, GameObject)
+
+    def create_stair_blocks(self, x, y):
+        """Create staggered blocks that can be climbed with jumps"""
+        heights = [0.5, 1.0, 1.5, 2.0, 1.5, 1.0]
+        offsets = [0, 0, 0, 0, 0, 0]
+
+        for i, (height, offset) in enumerate(zip(heights, offsets)):
+            block_size = [2.0, 2.0, height]
+            block_pos = (x + i * 2, y + offset, height / 2)
+            self.game_world.create_object(block_pos, "crate", block_size, 0, GameObject)
+
+    def create_low_high_combo(self, x, y):
+        """Create an obstacle requiring first crouching then jumping"""
+        # Low ceiling section
+        self.create_low_ceiling(x, y, 3, 1.2)
+
+        # Gap after low ceiling
+        self.create_gap(x + 5, y, 2, 0)
+
+    def create_zigzag_platforms(self, x, y):
+        """Create zigzag platforms requiring jumps in different directions"""
+        offsets = [0, 2, -2, 2, -2]
+        widths = [3, 2, 2, 2, 3]
+
+        for i, (offset, width) in enumerate(zip(offsets, widths)):
+            platform_size = [width, 2.0, 0.5]
+            platform_pos = (x + i * 3, y + offset, 0)
+            self.game_world.create_object(platform_pos, "floor", platform_size, 0, GameObject)
+
+    def create_variable_tunnel(self, x, y, length):
+        """Create a tunnel with varying height that requires precise crouching"""
+        # Platform below
+        platform_size = [length, 5.0, 1.0]
+        platform_pos = (x + length / 2, y, 0)
+        self.game_world.create_object(platform_pos, "floor", platform_size, 0, GameObject)
+
+        heights = [1.4, 1.2, 1.3, 1.1, 1.4, 1.2, 1.0, 1.3]
+        segment_width = length / len(heights)
+
+        for i, height in enumerate(heights):
+            ceiling_size = [segment_width, 5.0, 0.5]
+            ceiling_pos = (x + i * segment_width + segment_width / 2, y, height)
+            self.game_world.create_object(ceiling_pos, "floor", ceiling_size, 0, GameObject)
+
+    def create_teleporter_trap(self, x, y):
+        """Create a trap with teleporters that send player backwards if touched"""
+        # Main platform
+        platform_size = [8.0, 5.0, 1.0]
+        platform_pos = (x + 4, y, 0)
+        self.game_world.create_object(platform_pos, "floor", platform_size, 0, GameObject)
+
+        # Teleporters
+        teleporter_positions = [(x + 2, y - 1, 0.5), (x + 4, y + 1, 0.5), (x + 6, y - 1, 0.5)]
+
+        for pos in teleporter_positions:
+            teleporter_size = [1.0, 1.0, 1.0]
+            teleporter = self.game_world.create_object(
+                pos, "teleporter", teleporter_size, 0, Teleporter
+            )
+            teleporter.is_collision_source = True
+
+    def create_final_challenge(self, x, y):
+        """Create a final challenge combining multiple obstacle types"""
+        # First part: low ceiling
+        self.create_low_ceiling(x, y, 2, 1.1)
+
+        # Second part: small gap
+        self.create_gap(x + 3, y, 1.5, 0)
+
+        # Third part: barrier
+        barrier_size = [0.5, 5.0, 1.2]
+        barrier_pos = (x + 6, y, 0.6)
+        self.game_world.create_object(barrier_pos, "red box", barrier_size, 0, GameObject)
+
+        # Fourth part: final platform to goal
+        platform_size = [3.0, 5.0, 1.0]
+        platform_pos = (x + 8, y, 0)
+        self.game_world.create_object(platform_pos, "floor", platform_size, 0, GameObject)
+
+    def is_complete(self, position):
+        return position[0] > self.goal_x
+
+    def has_fallen(self, position):
+        return position[2] < self.fall_z
@@ -5,37 +5,32 @@ from panda3d.bullet import BulletDebugNode
 from panda3d.core import CollisionNode, GeomNode, CollisionRay, CollisionHandlerQueue, CollisionTraverser, MouseButton, \
     WindowProperties, Quat, Vec3, Point3
 from direct.showbase.InputStateGlobal import inputState
-from pubsub import pub
+import argparse
 import sys
 import random
 
-from kcc import PandaBulletCharacterController
+from character_manager import CharacterManager
+from fixed_step import FixedStepClock
 from world_view import WorldView
 from game_world import GameWorld
-from game_object import GameObject
-from player import Player
-from teleporter import Teleporter
-
-controls = {
-    'escape': 'toggleMouseMove',
-    't': 'teleport',
-    'mouse1': 'toggleTexture',
-    'space': 'jump',
-    'c': 'crouch',
-    'r': 'restart',
-}
-
-held_keys = {
-    'w': 'moveForward',
-    's': 'moveBackward',
-    'a': 'moveLeft',
-    'd': 'moveRight',
-}
-
-
-class ObstacleGameController(ShowBase):
-    def __init__(self):
+from input_log import InputRecorder
+from kcc_telemetry import Telemetry
+from obstacle_course import ObstacleCourse
+from player_controls import PlayerControls, controls, held_keys
+from static_baking import owner_of
+
+
+class ObstacleGameController(ShowBase, PlayerControls):
+    def __init__(self, record=None, telemetry=None):
         ShowBase.__init__(self)
+
+        # Where to save the input log, see InputRecorder
+        self.record = record
+        self.recorder = InputRecorder() if record else None
+
+        # Where to save what the character controllers did, see Telemetry
+        self.telemetry_file = telemetry
+        self.telemetry = Telemetry() if telemetry else None
         self.disableMouse()
         self.render.setShaderAuto()
 
@@ -52,16 +47,23 @@ class ObstacleGameController(ShowBase):
         self.game_world = GameWorld(debugNode)
         self.world_view = WorldView(self.game_world)
 
+        # The simulation always runs in steps of the same size, however
+        # fast we render, see step().  The views and camera are drawn
+        # between the last two steps.
+        self.clock = FixedStepClock()
+        self.game_world.set_physics_rate(self.clock.step_size, 1)
+
         # Set up collision traverser
         self.cTrav = CollisionTraverser()
 
-        # Track player
+        # Track player, every player object gets a kcc and the first is ours
         self.instances = []
-        self.player = None
-        pub.subscribe(self.new_player_object, 'create')
+        self.characters = CharacterManager(self.game_world, self.render, self.telemetry)
 
         # Build the obstacle course
         self.create_obstacle_course()
+        self.player = self.characters.player
+        self.previous_position = Vec3(self.player.getPos())
 
         # Set up inputs
         self.input_events = {}
@@ -81,7 +83,7 @@ class ObstacleGameController(ShowBase):
         self.camera_pitch = 0
 
         # Subscribe to input events
-        pub.subscribe(self.handle_input, 'input')
+        self.game_world.input_topic.subscribe(self.handle_input)
 
         # Add game loop task
         self.taskMgr.add(self.tick, "GameLoop")
@@ -90,230 +92,15 @@ class ObstacleGameController(ShowBase):
         self.run()
 
     def create_obstacle_course(self):
-        # Create ground floor
-        floor_size = [100.0, 40.0, 1.0]
-        floor_pos = (0, 0, -0.5)
-        self.floor = self.game_world.create_object(
-            floor_pos, "floor", floor_size, 0, GameObject
-        )
-
-        # Create starting platform
-        start_size = [5.0, 5.0, 1.0]
-        start_pos = (0, 0, 0)
-        self.start = self.game_world.create_object(
-            start_pos, "floor", start_size, 0, GameObject
-        )
-
-        # Create player at start position
-        player_size = [2.0, 1.0, 0.5, 0.5]  # walkHeight, crouchHeight, stepHeight, radius
-        player_pos = (0, 0, 2)
-        self.player_obj = self.game_world.create_object(
-            player_pos, "player", player_size, 1.0, Player
-        )
-
-        # ---- OBSTACLE 1: Small jump ----
-        self.create_gap(5, 0, 2, 1)
-
-        # ---- OBSTACLE 2: Crouch under ceiling ----
-        self.create_low_ceiling(10, 0, 3, 1.5)
-
-        # ---- OBSTACLE 3: Medium jump ----
-        self.create_gap(15, 0, 3, 1)
-
-        # ---- OBSTACLE 4: Tall barrier to jump over ----
-        self.create_barrier(20, 0, 1.5, 1)
-
-        # ---- OBSTACLE 5: Two-step crouch section ----
-        self.create_crouch_tunnel(25, 0, 5, 1.2)
-
-        # ---- OBSTACLE 6: Wide gap ----
-        self.create_gap(35, 0, 4, 1)
-
-        # ---- OBSTACLE 7: Staggered blocks to climb ----
-        self.create_stair_blocks(42, 0)
-
-        # ---- OBSTACLE 8: Low then high ----
-        self.create_low_high_combo(50, 0)
-
-        # ---- OBSTACLE 9: Zigzag jump platforms ----
-        self.create_zigzag_platforms(60, 0)
-
-        # ---- OBSTACLE 10: Long crouch tunnel with varying height ----
-        self.create_variable_tunnel(70, 0, 8)
-
-        # ---- OBSTACLE 11: Teleporter trap ----
-        self.create_teleporter_trap(82, 0)
-
-        # ---- OBSTACLE 12: Final challenge - combination ----
-        self.create_final_challenge(90, 0)
-
-        # Create end goal
-        goal_size = [5.0, 5.0, 3.0]
-        goal_pos = (100, 0, 1.5)
-        self.goal = self.game_world.create_object(
-            goal_pos, "crate", goal_size, 0, GameObject
-        )
-
-    def create_gap(self, x, y, width, height):
-        """Create a gap obstacle that requires jumping"""
-        # Platform before gap
-        platform1_size = [3.0, 5.0, 1.0]
-        platform1_pos = (x - 2, y, height - 0.5)
-        self.game_world.create_object(platform1_pos, "floor", platform1_size, 0, GameObject)
-
-        # Platform after gap
-        platform2_size = [3.0, 5.0, 1.0]
-        platform2_pos = (x + width + 2, y, height - 0.5)
-        self.game_world.create_object(platform2_pos, "floor", platform2_size, 0, GameObject)
-
-    def create_low_ceiling(self, x, y, length, height):
-        """Create a low ceiling that requires crouching"""
-        # Platform below
-        platform_size = [length, 5.0, 1.0]
-        platform_pos = (x + length / 2, y, 0)
-        self.game_world.create_object(platform_pos, "floor", platform_size, 0, GameObject)
-
-        # Ceiling above
-        ceiling_size = [length, 5.0, 0.5]
-        ceiling_pos = (x + length / 2, y, height)
-        self.game_world.create_object(ceiling_pos, "floor", ceiling_size, 0, GameObject)
-
-    def create_barrier(self, x, y, height, width):
-        """Create a tall barrier to jump over"""
-        barrier_size = [width, 5.0, height]
-        barrier_pos = (x, y, height / 2)
-        self.game_world.create_object(barrier_pos, "red box", barrier_size, 0, GameObject)
-
-        # Platforms on either side
-        platform1_size = [3.0, 5.0, 1.0]
-        platform1_pos = (x - 2, y, 0)
-        self.game_world.create_object(platform1_pos, "floor", platform1_size, 0, GameObject)
-
-        platform2_size = [3.0, 5.0, 1.0]
-        platform2_pos = (x + 2, y, 0)
-        self.game_world.create_object(platform2_pos, "floor", platform2_size, 0, GameObject)
-
-    def create_crouch_tunnel(self, x, y, length, height):
-        """Create a tunnel that requires crouching for a distance"""
-        # Platform below
-        platform_size = [length, 5.0, 1.0]
-        platform_pos = (x + length / 2, y, 0)
-        self.game_world.create_object(platform_pos, "floor", platform_size, 0, GameObject)
-
-        # First ceiling section
-        ceiling1_size = [2.0, 5.0, 0.5]
-        ceiling1_pos = (x + 1, y, height)
-        self.game_world.create_object(ceiling1_pos, "floor", ceiling1_size, 0, GameObject)
-
-        # Second ceiling section - lower
-        ceiling2_size = [length - 4, 5.0, 0.5]
-        ceiling2_pos = (x + length / 2, y, height - 0.2)
-        self.game_world.create_object(ceiling2_pos, "floor", ceiling2_size, 0, GameObject)
-
-        # Third ceiling section
-        ceiling3_size = [2.0, 5.0, 0.5]
-        ceiling3_pos = (x + length - 1, y, height)
-        self.game_world.create_object(ceiling3_pos, "floor", ceiling3_size, 0, GameObject)
-
-    def create_stair_blocks(self, x, y):
-        """Create staggered blocks that can be climbed with jumps"""
-        heights = [0.5, 1.0, 1.5, 2.0, 1.5, 1.0]
-        offsets = [0, 0, 0, 0, 0, 0]
-
-        for i, (height, offset) in enumerate(zip(heights, offsets)):
-            block_size = [2.0, 2.0, height]
-            block_pos = (x + i * 2, y + offset, height / 2)
-            self.game_world.create_object(block_pos, "crate", block_size, 0, GameObject)
-
-    def create_low_high_combo(self, x, y):
-        """Create an obstacle requiring first crouching then jumping"""
-        # Low ceiling section
-        self.create_low_ceiling(x, y, 3, 1.2)
-
-        # Gap after low ceiling
-        self.create_gap(x + 5, y, 2, 0)
-
-    def create_zigzag_platforms(self, x, y):
-        """Create zigzag platforms requiring jumps in different directions"""
-        offsets = [0, 2, -2, 2, -2]
-        widths = [3, 2, 2, 2, 3]
-
-        for i, (offset, width) in enumerate(zip(offsets, widths)):
-            platform_size = [width, 2.0, 0.5]
-            platform_pos = (x + i * 3, y + offset, 0)
-            self.game_world.create_object(platform_pos, "floor", platform_size, 0, GameObject)
-
-    def create_variable_tunnel(self, x, y, length):
-        """Create a tunnel with varying height that requires precise crouching"""
-        # Platform below
-        platform_size = [length, 5.0, 1.0]
-        platform_pos = (x + length / 2, y, 0)
-        self.game_world.create_object(platform_pos, "floor", platform_size, 0, GameObject)
-
-        heights = [1.4, 1.2, 1.3, 1.1, 1.4, 1.2, 1.0, 1.3]
-        segment_width = length / len(heights)
-
-        for i, height in enumerate(heights):
-            ceiling_size = [segment_width, 5.0, 0.5]
-            ceiling_pos = (x + i * segment_width + segment_width / 2, y, height)
-            self.game_world.create_object(ceiling_pos, "floor", ceiling_size, 0, GameObject)
-
-    def create_teleporter_trap(self, x, y):
-        """Create a trap with teleporters that send player backwards if touched"""
-        # Main platform
-        platform_size = [8.0, 5.0, 1.0]
-        platform_pos = (x + 4, y, 0)
-        self.game_world.create_object(platform_pos, "floor", platform_size, 0, GameObject)
-
-        # Teleporters
-        teleporter_positions = [(x + 2, y - 1, 0.5), (x + 4, y + 1, 0.5), (x + 6, y - 1, 0.5)]
-
-        for pos in teleporter_positions:
-            teleporter_size = [1.0, 1.0, 1.0]
-            teleporter = self.game_world.create_object(
-                pos, "teleporter", teleporter_size, 0, Teleporter
-            )
-            teleporter.is_collision_source = True
-
-    def create_final_challenge(self, x, y):
-        """Create a final challenge combining multiple obstacle types"""
-        # First part: low ceiling
-        self.create_low_ceiling(x, y, 2, 1.1)
-
-        # Second part: small gap
-        self.create_gap(x + 3, y, 1.5, 0)
-
-        # Third part: barrier
-        barrier_size = [0.5, 5.0, 1.2]
-        barrier_pos = (x + 6, y, 0.6)
-        self.game_world.create_object(barrier_pos, "red box", barrier_size, 0, GameObject)
-
-        # Fourth part: final platform to goal
-        platform_size = [3.0, 5.0, 1.0]
-        platform_pos = (x + 8, y, 0)
-        self.game_world.create_object(platform_pos, "floor", platform_size, 0, GameObject)
+        self.course = ObstacleCourse(self.game_world)
+        self.course.build()
+
+        # Where the restart control takes us back to
+        self.game_world.mark_initial_state()
 
     def input_event(self, event):
         self.input_events[event] = True
 
-    def new_player_object(self, game_object):
-        if game_object.kind != 'player':
-            return
-
-        self.player = PandaBulletCharacterController(self.game_world.physics_world, self.render, game_object)
-
-    def handle_input(self, events=None):
-        # Debug output on click
-        if 'toggleTexture' in events:
-            print(f"Player position: {self.player.getPos()}")
-
-        # Handle crouch toggle
-        if 'crouch' in events:
-            if self.player.isCrouching:
-                self.player.stopCrouch()
-            else:
-                self.player.startCrouch()
-
     def forward(self, hpr, pos, distance):
         h, p, r = hpr
         x, y, z = pos
@@ -325,21 +112,15 @@ class ObstacleGameController(ShowBase):
         delta_z = forward[2]
         return x + delta_x * distance, y + delta_y * distance, z + delta_z * distance
 
-    def is_key_active(self, key):
-        if key in self.input_events:
-            return True
-
-        if inputState.isSet(key):
-            return True
-
-        return False
+    def is_key_held(self, key):
+        return inputState.isSet(key)
 
     # In obstacle_game.py file
     # Modify the tick method in ObstacleGameController class
 
     def tick(self, task):
         # Handle escape key for mouse control
-        if 'toggleMouseMove' in self.input_events:
+        if self.input_events.pop('toggleMouseMove', None):
             if self.CursorOffOn == 'Off':
                 self.CursorOffOn = 'On'
                 self.props.setCursorHidden(False)
@@ -349,17 +130,13 @@ class ObstacleGameController(ShowBase):
 
             self.win.requestProperties(self.props)
 
-        # Send input events to subscribers
-        pub.sendMessage('input', events=self.input_events)
-
-        # Move player based on input
-        self.move_player(self.input_events)
-
         # Check for object interaction
         picked_object = self.game_world.get_nearest(self.player.getPos(),
                                                     self.forward(self.player.getHpr(), self.player.getPos(), 5))
-        if picked_object and picked_object.getNode() and picked_object.getNode().getPythonTag("owner"):
-            picked_object.getNode().getPythonTag("owner").selected()
+        if picked_object and picked_object.getNode():
+            owner = owner_of(picked_object.getNode(), picked_object.getTriangleIndex())
+            if owner:
+                owner.selected()
 
         # Handle mouse movement for camera rotation
         if self.CursorOffOn == 'Off':
@@ -378,6 +155,17 @@ class ObstacleGameController(ShowBase):
                 self.player.setH(z_rotation)
                 self.camera_pitch = x_rotation
 
+        # Run however many simulation steps this frame's time adds up to.
+        # Input events go with the first, or wait for the next frame if
+        # there isn't one.
+        for _ in range(self.clock.advance(globalClock.getDt())):
+            self.step()
+            self.input_events.clear()
+
+        # Draw everything where it was part way between the last two steps
+        alpha = self.clock.alpha
+        self.world_view.interpolate(alpha)
+
         # Update camera position and rotation
         h = self.player.getH()
         p = self.camera_pitch
@@ -385,7 +173,8 @@ class ObstacleGameController(ShowBase):
         self.camera.setHpr(h, p, r)
 
         # Position camera at player's head level with slight offset
-        x, y, z = self.player.getPos()
+        previous = self.previous_position
+        x, y, z = previous + (Vec3(self.player.getPos()) - previous) * alpha
         if self.player.isCrouching:
             z_adjust = self.player.game_object.size[1]
         else:
@@ -395,52 +184,71 @@ class ObstacleGameController(ShowBase):
 
         # Check if player reached the goal
         player_pos = self.player.getPos()
-        if player_pos[0] > 95:
+        if self.course.is_complete(player_pos):
             print("Congratulations! You completed the obstacle course!")
             # Optional: exit the game after a delay
             # import sys
             # sys.exit()
 
         # Check if player has fallen below a threshold
-        if player_pos[2] < -10:  # Adjust this value based on your level design
+        if self.course.has_fallen(player_pos):
             print("Game Over! You fell off the course.")
             self.game_world.set_property("quit", True)  # This will trigger exit in the next frame
 
-        # Update physics and game state
-        dt = globalClock.getDt()
-        self.player.update(dt)
-        self.game_world.tick(dt)
-        self.world_view.tick()
-
         # Check for quit command
         if self.game_world.get_property("quit"):
+            self.save_recording()
+            self.save_telemetry()
             sys.exit()
 
-        # Clear input events for next frame
-        self.input_events.clear()
         return Task.cont
 
-    def move_player(self, events=None):
-        speed = Vec3(0, 0, 0)
-        delta = 5.0
+    def step(self):
+        dt = self.clock.step_size
 
-        if self.is_key_active('moveForward'):
-            speed.setY(delta)
+        # Send input events to subscribers
+        self.game_world.input_topic.send(self.input_events)
 
-        if self.is_key_active('moveBackward'):
-            speed.setY(-delta)
+        # Move player based on input
+        self.move_player(self.input_events)
 
-        if self.is_key_active('moveLeft'):
-            speed.setX(-delta)
+        # Keep the part of the world around the player live
+        self.game_world.update_streaming(self.player.getPos())
+
+        # Update physics and game state
+        if self.recorder:
+            held = [name for name in held_keys.values() if inputState.isSet(name)]
+            self.recorder.record(dt, self.input_events, held, self.player.getH())
+
+        self.previous_position = Vec3(self.player.getPos())
+
+        self.characters.update(dt)
+        self.game_world.tick(dt)
+        self.world_view.tick()
 
-        if self.is_key_active('moveRight'):
-            speed.setX(delta)
 
-        if self.is_key_active('jump'):
-            self.player.startJump(2)
+    def save_recording(self):
+        if self.recorder:
+            self.recorder.save(self.record)
+            print(f"Saved {len(self.recorder)} frames of input to {self.record}")
 
-        self.player.setLinearMovement(speed)
+    def save_telemetry(self):
+        if self.telemetry is not None:
+            self.telemetry.save(self.telemetry_file)
+            print(f"Saved {len(self.telemetry)} character events to {self.telemetry_file}")
+
+    def finalizeExit(self):
+        # Closing the window ends up here rather than at the quit check
+        self.save_recording()
+        self.save_telemetry()
+        ShowBase.finalizeExit(self)
 
 
 if __name__ == '__main__':
-    game = ObstacleGameController()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--record', metavar='FILE', help="save this session's input, replay it with headless.py FILE")
+    parser.add_argument('--telemetry', metavar='FILE',
+                        help="save the character controllers' events, as CSV if FILE ends in .csv")
+    args = parser.parse_args()
+
+    game = ObstacleGameController(record=args.record, telemetry=args.telemetry)
\ No newline at end of file
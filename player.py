@@ -1,15 +1,18 @@
 from panda3d.core import Quat, lookAt, Vec3, TransformState, VBase3
 from game_object import GameObject
-from pubsub import pub
 
 class Player(GameObject):
+    __slots__ = ('speed',)
+
+    # A kcc is built around each player by whoever created it, so a
+    # recycled one would come back without its controller
+    poolable = False
+
     def __init__(self, position, kind, id, size, physics):
         super().__init__(position, kind, id, size, physics)
 
         self.speed = 0.1
 
-        pub.subscribe(self.input_event, 'input')
-
     def input_event(self, events=None):
         pass
 
@@ -20,11 +23,21 @@ class Player(GameObject):
     # or the kcc won't work properly.
     @property
     def position(self):
+        if self.store is not None:
+            return self.store.position(self.slot)
+
         return self._position
 
     @position.setter
     def position(self, value):
-        self._position = value
+        self.sync_position(value)
+
+    def get_bounds(self):
+        # The kcc keeps the player's position at their feet
+        x, y, z = self.position
+        height = self.size[0]
+        radius = self.size[3]
+        return (x - radius, y - radius, z), (x + radius, y + radius, z + height)
 
     # Override these so we can use the physics object size
     # to allow for proper crouching
@@ -37,4 +50,7 @@ class Player(GameObject):
 
     @size.setter
     def size(self, value):
-        self._size = value
\ No newline at end of file
+        self._size = value
+
+        if self.store is not None:
+            self.store.set_size(self.slot, value)
\ No newline at end of file
@@ -0,0 +1,75 @@
+from panda3d.core import Vec3
+
+controls = {
+    'escape': 'toggleMouseMove',
+    't': 'teleport',
+    'mouse1': 'toggleTexture',
+    'space': 'jump',
+    'c': 'crouch',
+    'r': 'restart',
+}
+
+held_keys = {
+    'w': 'moveForward',
+    's': 'moveBackward',
+    'a': 'moveLeft',
+    'd': 'moveRight',
+}
+
+
+class PlayerControls:
+    """
+    Turns input events into player movement.  This is shared by the windowed
+    game and the headless runner so both drive the kcc the same way.
+
+    Classes using this need self.player (the kcc), self.game_world and
+    self.input_events, and should override is_key_held to report the state of the keys in held_keys.
+    """
+
+    def is_key_held(self, key):
+        return False
+
+    def is_key_active(self, key):
+        if key in self.input_events:
+            return True
+
+        if self.is_key_held(key):
+            return True
+
+        return False
+
+    def handle_input(self, events=None):
+        if 'restart' in events:
+            self.game_world.reset()
+
+        # Debug output on click
+        if 'toggleTexture' in events:
+            print(f"Player position: {self.player.getPos()}")
+
+        # Handle crouch toggle
+        if 'crouch' in events:
+            if self.player.isCrouching:
+                self.player.stopCrouch()
+            else:
+                self.player.startCrouch()
+
+    def move_player(self, events=None):
+        speed = Vec3(0, 0, 0)
+        delta = 5.0
+
+        if self.is_key_active('moveForward'):
+            speed.setY(delta)
+
+        if self.is_key_active('moveBackward'):
+            speed.setY(-delta)
+
+        if self.is_key_active('moveLeft'):
+            speed.setX(-delta)
+
+        if self.is_key_active('moveRight'):
+            speed.setX(delta)
+
+        if self.is_key_active('jump'):
+            self.player.startJump(2)
+
+        self.player.setLinearMovement(speed)
@@ -0,0 +1,54 @@
+from panda3d.bullet import BulletBoxShape, BulletCapsuleShape, ZUp
+from panda3d.core import Vec3
+
+
+class ShapeCache:
+    """
+    Hands out shared collision shapes so objects of the same shape and size
+    don't each get their own.  Bullet shapes can be used by any number of
+    bodies at once.
+
+    Shapes are reference counted by key.  A shape whose count drops to zero
+    is kept around in case it's needed again until purge() is called.
+    """
+
+    # Sizes are rounded to this many decimal places for the key, so values
+    # that differ only by floating point noise share a shape
+    precision = 6
+
+    def __init__(self):
+        self.shapes = {}
+        self.counts = {}
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def box(self, size):
+        # The box shape needs half the size in each dimension
+        half = (round(size[0] / 2, self.precision), round(size[1] / 2, self.precision), round(size[2] / 2, self.precision))
+        key = ('box',) + half
+
+        shape = self.shapes.get(key)
+        if shape is None:
+            shape = self.shapes[key] = BulletBoxShape(Vec3(*half))
+
+        self.counts[key] = self.counts.get(key, 0) + 1
+        return shape, key
+
+    def capsule(self, radius, height):
+        key = ('capsule', round(radius, self.precision), round(height, self.precision))
+
+        shape = self.shapes.get(key)
+        if shape is None:
+            shape = self.shapes[key] = BulletCapsuleShape(radius, height, ZUp)
+
+        self.counts[key] = self.counts.get(key, 0) + 1
+        return shape, key
+
+    def release(self, key):
+        self.counts[key] -= 1
+
+    def purge(self):
+        for key in [key for key, count in self.counts.items() if count <= 0]:
+            del self.shapes[key]
+            del self.counts[key]
@@ -0,0 +1,207 @@
+import math
+
+
+class SpatialGrid:
+    """
+    A uniform grid over the x/y plane for finding things by location.
+
+    Items are anything hashable, stored with axis aligned bounds given as
+    ((min x, min y, min z), (max x, max y, max z)).  Each item is listed in
+    every grid column its bounds cover, and z is checked exactly at query
+    time.  Items covering more than max_cells columns (a big ground plane,
+    say) are kept in a separate list that every query checks.
+    """
+
+    def __init__(self, cell_size=4.0, max_cells=64):
+        self.cell_size = cell_size
+        self.max_cells = max_cells
+
+        self.cells = {}
+        self.bounds = {}
+        self.item_cells = {}
+        self.oversized = set()
+
+        # Grows to cover everything ever inserted, which bounds nearest_k's search
+        self.extent = None
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def __contains__(self, item):
+        return item in self.bounds
+
+    def cell_range(self, lo, hi):
+        size = self.cell_size
+        return (math.floor(lo[0] / size), math.floor(lo[1] / size),
+                math.floor(hi[0] / size), math.floor(hi[1] / size))
+
+    def insert(self, item, bounds):
+        self.place(item, bounds)
+        self.grow(*bounds)
+
+    def insert_many(self, items):
+        """
+        Insert a list of (item, bounds) pairs, growing the extent just once.
+        """
+        for item, bounds in items:
+            self.place(item, bounds)
+
+        if items:
+            lows, highs = zip(*(bounds for item, bounds in items))
+            self.grow(tuple(map(min, *lows)) if len(lows) > 1 else lows[0],
+                      tuple(map(max, *highs)) if len(highs) > 1 else highs[0])
+
+    def place(self, item, bounds):
+        lo, hi = bounds
+        cells = self.cell_range(lo, hi)
+
+        self.bounds[item] = bounds
+        self.item_cells[item] = cells
+
+        i0, j0, i1, j1 = cells
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > self.max_cells:
+            self.oversized.add(item)
+        else:
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    cell = self.cells.get((i, j))
+                    if cell is None:
+                        self.cells[(i, j)] = {item}
+                    else:
+                        cell.add(item)
+
+    def grow(self, lo, hi):
+        if self.extent is None:
+            self.extent = (tuple(lo), tuple(hi))
+        else:
+            elo, ehi = self.extent
+            self.extent = (tuple(map(min, elo, lo)), tuple(map(max, ehi, hi)))
+
+    def remove(self, item):
+        if item not in self.bounds:
+            return
+
+        del self.bounds[item]
+        cells = self.item_cells.pop(item)
+
+        if item in self.oversized:
+            self.oversized.discard(item)
+            return
+
+        i0, j0, i1, j1 = cells
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                cell = self.cells[(i, j)]
+                cell.discard(item)
+                if not cell:
+                    del self.cells[(i, j)]
+
+    def update(self, item, bounds):
+        lo, hi = bounds
+        if self.item_cells.get(item) == self.cell_range(lo, hi):
+            # Still in the same cells, only the exact bounds changed
+            self.bounds[item] = bounds
+            return
+
+        self.remove(item)
+        self.insert(item, bounds)
+
+    def clear(self):
+        self.cells.clear()
+        self.bounds.clear()
+        self.item_cells.clear()
+        self.oversized.clear()
+        self.extent = None
+
+    def candidates(self, lo, hi):
+        i0, j0, i1, j1 = self.cell_range(lo, hi)
+
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self.cells):
+            # Cheaper to look at every occupied cell than every cell in range
+            found = set(self.oversized)
+            for (i, j), cell in self.cells.items():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    found.update(cell)
+            return found
+
+        found = set(self.oversized)
+        cells = self.cells
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                cell = cells.get((i, j))
+                if cell:
+                    found.update(cell)
+
+        return found
+
+    def query_aabb(self, lo, hi):
+        """
+        Everything whose bounds overlap the box from lo to hi.
+        """
+        result = []
+        bounds = self.bounds
+        for item in self.candidates(lo, hi):
+            ilo, ihi = bounds[item]
+            if ilo[0] <= hi[0] and ihi[0] >= lo[0] and \
+                    ilo[1] <= hi[1] and ihi[1] >= lo[1] and \
+                    ilo[2] <= hi[2] and ihi[2] >= lo[2]:
+                result.append(item)
+
+        return result
+
+    def query_radius(self, center, radius):
+        """
+        Everything whose bounds come within radius of center.
+        """
+        x, y, z = center
+        lo = (x - radius, y - radius, z - radius)
+        hi = (x + radius, y + radius, z + radius)
+
+        radius_sq = radius * radius
+        bounds = self.bounds
+        return [item for item in self.candidates(lo, hi)
+                if distance_sq_to_box(center, bounds[item]) <= radius_sq]
+
+    def nearest_k(self, point, k):
+        """
+        The k items whose bounds are closest to point, closest first.
+        """
+        if k <= 0 or not self.bounds:
+            return []
+
+        # Widest we'd ever need to look is the farthest corner of everything inserted
+        elo, ehi = self.extent
+        limit = math.sqrt(sum(max(abs(p - a), abs(p - b)) ** 2 for p, a, b in zip(point, elo, ehi)))
+
+        # Anything not found within radius is farther away than everything
+        # that was, so once we have k we're done
+        x, y, z = point
+        radius = self.cell_size
+        while True:
+            lo = (x - radius, y - radius, z - radius)
+            hi = (x + radius, y + radius, z + radius)
+
+            radius_sq = radius * radius
+            found = []
+            for item in self.candidates(lo, hi):
+                distance_sq = distance_sq_to_box(point, self.bounds[item])
+                if distance_sq <= radius_sq:
+                    found.append((distance_sq, item))
+
+            if len(found) >= k or radius >= limit:
+                found.sort(key=lambda pair: pair[0])
+                return [item for _, item in found[:k]]
+
+            radius *= 2.0
+
+
+def distance_sq_to_box(point, bounds):
+    lo, hi = bounds
+    total = 0.0
+    for p, a, b in zip(point, lo, hi):
+        if p < a:
+            total += (a - p) ** 2
+        elif p > b:
+            total += (p - b) ** 2
+
+    return total
@@ -0,0 +1,72 @@
+import math
+
+from panda3d.bullet import BulletRigidBodyNode
+from panda3d.core import TransformState, Vec3
+
+
+def owner_of(node, index=-1):
+    """
+    The game object a physics node belongs to.  A baked region holds many
+    objects in one node, so for those index picks out the child shape, as
+    given by a ray result's triangle index or a manifold point's index.
+    """
+    owner = node.getPythonTag("owner")
+    if owner is None:
+        owners = node.getPythonTag("owners")
+        if owners and 0 <= index < len(owners):
+            return owners[index]
+
+    return owner
+
+
+class StaticRegion:
+    """
+    One compound body standing in for the static objects in a square region.
+    Child shape i of the node belongs to objects[i].  size is the region
+    size it was baked with, so it can be baked again after it's undone.
+    """
+
+    def __init__(self, key, objects, origin, size):
+        self.key = key
+        self.objects = objects
+        self.size = size
+
+        self.node = BulletRigidBodyNode(f"static region {key[0]} {key[1]}")
+        self.node.setTransform(TransformState.makePos(origin))
+        self.node.setRestitution(0.0)
+
+        to_region = TransformState.makePos(-origin)
+        owners = []
+        for game_object in objects:
+            physics = game_object.physics
+            body_transform = to_region.compose(physics.getTransform())
+            for i in range(physics.getNumShapes()):
+                self.node.addShape(physics.getShape(i), body_transform.compose(physics.getShapeTransform(i)))
+                owners.append(game_object)
+
+        self.node.setPythonTag("owners", owners)
+
+
+def region_key(game_object, region_size):
+    x, y, z = game_object.position
+    return math.floor(x / region_size), math.floor(y / region_size)
+
+
+def bake_regions(game_objects, region_size):
+    """
+    Group static objects by the region their position falls in and build a
+    StaticRegion for each group with more than one object in it.
+    """
+    groups = {}
+    for game_object in game_objects:
+        groups.setdefault(region_key(game_object, region_size), []).append(game_object)
+
+    regions = []
+    for key, objects in groups.items():
+        if len(objects) < 2:
+            continue
+
+        origin = Vec3((key[0] + 0.5) * region_size, (key[1] + 0.5) * region_size, 0)
+        regions.append(StaticRegion(key, objects, origin, region_size))
+
+    return regions
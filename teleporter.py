@@ -1,8 +1,9 @@
 from panda3d.core import Quat, lookAt, Vec3
 from game_object import GameObject
-from pubsub import pub
 
 class Teleporter(GameObject):
+    __slots__ = ()
+
     def __init__(self, position, kind, id, size, physics):
         super().__init__(position, kind, id, size, physics)
 
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# The game's modules live at the top of the repo, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def showbase():
+    # Imported here so tests that don't draw anything never start Panda's
+    # window machinery.  Models/ and Textures/ are found from the top of
+    # the repo.
+    from direct.showbase.ShowBase import ShowBase
+    from panda3d.core import Filename, getModelPath
+
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    getModelPath().prependDirectory(Filename.fromOsSpecific(repo))
+    base = ShowBase(windowType='none')
+    yield base
+    base.destroy()
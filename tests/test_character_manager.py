@@ -0,0 +1,28 @@
+from headless import HeadlessGame
+from kcc_benchmark import WallCourse
+from player import Player
+
+
+class PlayerAtWall(WallCourse):
+    def build(self):
+        super().build()
+        self.game_world.create_object((0, 0, 0.5), 'player', [2.0, 1.0, 0.5, 0.5], 1.0, Player)
+
+
+def test_restore_ignores_contacts_from_before():
+    game = HeadlessGame(course=PlayerAtWall)
+    player = game.player
+    player.setH(-90.0)
+
+    # Leaning into the wall keeps a manifold pushing the player back
+    for _ in range(200):
+        game.step((), ('moveForward',))
+    assert player.getX() > 5.0
+    assert player in game.characters.penetrations()
+
+    game.game_world.reset()
+    for _ in range(3):
+        game.step()
+
+    x, y, z = player.getPos()
+    assert abs(x) < 1e-6 and abs(y) < 1e-6
@@ -0,0 +1,18 @@
+import pytest
+
+from course_generator import CourseSpec, generate_level
+from course_validator import validator_for_level
+
+
+@pytest.mark.parametrize('difficulty', [0.0, 0.5, 1.0])
+def test_generated_courses_can_be_finished(difficulty):
+    for seed in range(8):
+        level, goal_x = generate_level(seed, CourseSpec(60, difficulty))
+        report = validator_for_level(level, f"seed {seed}", goal_x=goal_x).validate()
+        assert report.completable, str(report)
+
+
+def test_same_seed_gives_the_same_course():
+    first, _ = generate_level(3, CourseSpec(30))
+    second, _ = generate_level(3, CourseSpec(30))
+    assert first.positions == second.positions and first.sizes == second.sizes
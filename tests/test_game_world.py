@@ -0,0 +1,61 @@
+from game_world import GameWorld
+from level_cache import Level, save_level
+from static_baking import owner_of
+
+
+def row(count, spacing=3.0):
+    return Level([[i * spacing, 0, 0] for i in range(count)], ['floor'] * count, [[2.0, 2.0, 1.0]] * count,
+                 [0] * count, ['GameObject'] * count, [False] * count)
+
+
+def test_load_world_bakes_only_when_asked(tmp_path):
+    filename = str(tmp_path / 'row.json')
+    save_level(row(20), filename)
+
+    game_world = GameWorld(None)
+    game_world.load_world(filename)
+    assert not game_world.baked
+    assert game_world.physics_world.getNumRigidBodies() == 20
+
+    game_world.load_world(filename, 32.0)
+    assert len(game_world.baked) == 20
+    assert game_world.physics_world.getNumRigidBodies() == 2
+
+    # And back, without leaving regions or loose bodies behind
+    game_world.load_world(filename)
+    assert not game_world.baked
+    assert game_world.physics_world.getNumRigidBodies() == 20
+
+
+def test_reload_rebakes_the_regions_it_edits(tmp_path):
+    filename = str(tmp_path / 'row.json')
+    level = row(20)
+    save_level(level, filename)
+
+    game_world = GameWorld(None)
+    game_world.load_world(filename, 32.0)
+    assert game_world.physics_world.getNumRigidBodies() == 2
+
+    # Move one floor up, one into the other region, take one out and
+    # make one bigger so it has to be rebuilt
+    level.positions[3][2] += 1.0
+    level.positions[4][0] = 40.0
+    for column in (level.positions, level.kinds, level.sizes, level.masses, level.classes, level.collision_sources):
+        del column[5]
+    level.sizes[6] = [2.0, 2.0, 2.0]
+
+    for _ in range(3):
+        save_level(level, filename)
+        game_world.reload_world(filename, 32.0)
+
+        # Still one body per region, nothing left loose
+        assert len(game_world.game_objects) == 19
+        assert len(game_world.baked) == 19
+        assert game_world.physics_world.getNumRigidBodies() == 2
+        level.positions[3][2] += 1.0
+
+    # The floor moved across is hit through the region it joined
+    result = game_world.get_nearest((40.0, 0.0, 10.0), (40.0, 0.0, -10.0))
+    moved = owner_of(result.getNode(), result.getTriangleIndex())
+    assert tuple(moved.position) == (40.0, 0.0, 0.0)
+    assert game_world.baked[moved.id].key == (1, 0)
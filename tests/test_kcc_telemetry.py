@@ -0,0 +1,29 @@
+from headless import HeadlessGame
+from kcc_telemetry import UPDATE, Telemetry
+
+
+def test_standalone_updates_each_get_a_frame():
+    game = HeadlessGame()
+    player = game.player
+    player.telemetry = telemetry = Telemetry()
+
+    for _ in range(5):
+        player.update(game.step_size)
+        game.game_world.tick(game.step_size)
+
+    events = telemetry.latest()
+    assert events[events['kind'] == UPDATE]['frame'].tolist() == [1, 2, 3, 4, 5]
+
+
+def test_character_manager_advances_the_frame_once_a_pass():
+    game = HeadlessGame()
+    telemetry = Telemetry()
+    game.characters.set_telemetry(telemetry)
+
+    for _ in range(3):
+        game.step()
+
+    # Controllers' own events share their pass's frame
+    events = telemetry.latest()
+    assert events[events['kind'] == UPDATE]['frame'].tolist() == [1, 2, 3]
+    assert events['frame'].min() >= 1 and events['frame'].max() == 3
@@ -0,0 +1,35 @@
+from level_cache import Level
+
+
+def floors(xs):
+    count = len(xs)
+    return Level([[x, 0, 0] for x in xs], ['floor'] * count, [[2.0, 2.0, 1.0 + x % 2] for x in xs],
+                 [0] * count, ['GameObject'] * count, [False] * count)
+
+
+def previous_entries(level):
+    return dict(zip(level.stable_keys(), level.entries()))
+
+
+def test_deleting_an_object_keeps_the_keys_of_the_rest():
+    before = floors([0, 3, 6, 9, 12])
+    keys = before.stable_keys()
+
+    after = floors([0, 6, 9, 12])
+    assert after.stable_keys(previous_entries(before)) == keys[:1] + keys[2:]
+
+
+def test_moved_object_keeps_its_key():
+    before = floors([0, 3, 6])
+    keys = before.stable_keys()
+
+    after = floors([0, 4, 6])
+    assert after.stable_keys(previous_entries(before)) == keys
+
+
+def test_new_objects_get_keys_nobody_has():
+    before = floors([0, 3])
+    after = floors([0, 3, 3, 20])
+    keys = after.stable_keys(previous_entries(before))
+    assert keys[:2] == before.stable_keys()
+    assert len(set(keys)) == 4
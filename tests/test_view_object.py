@@ -0,0 +1,25 @@
+from panda3d.core import Point3, Quat, TransformState, Vec3
+
+from game_object import GameObject
+from game_world import GameWorld
+from view_object import ViewObject
+
+
+def test_interpolated_rotated_body_is_drawn_between_steps(showbase):
+    game_world = GameWorld(None)
+    crate = game_world.create_object((0, 0, 0), "crate", [1.0, 2.0, 3.0], 1.0, GameObject)
+    view = ViewObject(crate)
+
+    # Tipped over on its side and turned, as a package knocked about would be
+    rotation = Quat()
+    rotation.setHpr((90, 0, 90))
+    crate.physics.setTransform(TransformState.makePosQuatScale(Point3(2, 1, 0), rotation, Vec3(1, 1, 1)))
+    crate.sync_position((2, 1, 0))
+    view.sync()
+
+    view.interpolate(0.25)
+    drawn = view.cube.getPos(showbase.render)
+    assert drawn.almostEqual(Vec3(0.5, 0.25, 0), 1e-4)
+
+    view.interpolate(1.0)
+    assert view.cube.getPos(showbase.render).almostEqual(Vec3(2, 1, 0), 1e-4)
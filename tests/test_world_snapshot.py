@@ -0,0 +1,34 @@
+from headless import HeadlessGame
+
+
+def settled_game():
+    game = HeadlessGame()
+    for _ in range(60):
+        game.step()
+    return game
+
+
+def test_restore_while_crouched_stands_at_the_saved_position():
+    game = settled_game()
+    start = game.game_world.initial_state.characters[game.player.game_object.id]
+
+    game.step(('crouch',))
+    for _ in range(30):
+        game.step()
+    assert game.player.isCrouching
+
+    game.game_world.reset()
+    game.step()
+
+    assert not game.player.isCrouching
+    assert game.player.getZ() <= start[5]
+
+
+def test_restore_in_place_falls_from_the_saved_position():
+    game = settled_game()
+
+    game.game_world.reset()
+    game.step()
+
+    assert game.player.getZ() <= 2.0
+    assert game.player.movementState == 'falling'
@@ -0,0 +1,67 @@
+from game_object import GameObject
+from game_world import GameWorld
+from world_view import WorldView
+
+
+def build_row(game_world, count, spacing=4.0):
+    # A long row of floors, a course the player runs down
+    with game_world.batch():
+        return [game_world.create_object((i * spacing, 0, 0), "floor", [2.0, 2.0, 1.0], 0.0, GameObject)
+                for i in range(count)]
+
+
+def stashed(showbase):
+    return showbase.render.node().getNumStashed()
+
+
+def test_streamed_out_views_are_deleted_not_parked(showbase):
+    game_world = GameWorld(None)
+    world_view = WorldView(game_world)
+    floors = build_row(game_world, 100)
+    assert len(world_view.view_objects) == 100
+
+    # Nothing is live until the first update, then only the start of the row
+    game_world.enable_streaming(32.0, 64.0, 16.0)
+    assert not world_view.view_objects
+    game_world.update_streaming((0, 0, 0))
+
+    assert 0 < len(world_view.view_objects) < 100
+    assert not world_view.parked_views
+    assert stashed(showbase) == 0
+
+    # Destroying a live object still parks its view for reuse
+    game_world.destroy_object(floors[0])
+    assert list(world_view.parked_views) == [floors[0].id]
+
+    game_world.purge_pool()
+    assert not world_view.parked_views
+    assert stashed(showbase) == 0
+
+
+def test_walking_the_row_keeps_only_nearby_views(showbase):
+    game_world = GameWorld(None)
+    world_view = WorldView(game_world)
+    floors = build_row(game_world, 200)
+    game_world.enable_streaming(32.0, 64.0, 16.0)
+
+    # The render is shared with earlier tests
+    others = showbase.render.getNumChildren()
+
+    # Down the row and back, across every chunk twice
+    most = 0
+    for x in list(range(0, 800, 8)) + list(range(800, -8, -8)):
+        game_world.update_streaming((x, 0, 0))
+
+        live = [floor for floor in floors if game_world.is_active(floor)]
+        assert len(world_view.view_objects) == len(live)
+        assert not world_view.parked_views
+        assert showbase.render.getNumChildren() - others == len(live)
+        assert stashed(showbase) == 0
+        most = max(most, len(live))
+
+    # Chunks within radius + hysteresis either side, never the whole row
+    assert most <= 2 * (64.0 + 16.0 + 32.0) / 4.0
+
+    # Coming back gives the first floor one fresh view, not a second cube
+    assert game_world.is_active(floors[0])
+    assert floors[0].physics.getNumChildren() == 1
@@ -0,0 +1,96 @@
+import numpy as np
+
+
+class TransformStore:
+    """
+    Keeps the position, rotation and size of every game object in a world
+    in contiguous arrays, one row (slot) per object, so they can be read
+    and written for many objects at once.
+
+    Rotations are stored as x, y, z rotation.  Sizes are padded to four
+    values with size_lens holding how many are real.  Rows of released
+    slots are reused, live says which rows belong to an object.
+    """
+
+    def __init__(self, capacity=1024):
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.positions = np.zeros((capacity, 3))
+        self.rotations = np.zeros((capacity, 3))
+        self.sizes = np.zeros((capacity, 4))
+        self.size_lens = np.zeros(capacity, dtype=np.uint8)
+        self.live = np.zeros(capacity, dtype=np.bool_)
+
+        self.objects = [None] * capacity
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self.objects) - len(self.free)
+
+    def grow(self):
+        old = len(self.objects)
+        new = old * 2
+
+        def resized(array, fill=0):
+            bigger = np.full((new,) + array.shape[1:], fill, dtype=array.dtype)
+            bigger[:old] = array
+            return bigger
+
+        self.ids = resized(self.ids, -1)
+        self.positions = resized(self.positions)
+        self.rotations = resized(self.rotations)
+        self.sizes = resized(self.sizes)
+        self.size_lens = resized(self.size_lens)
+        self.live = resized(self.live)
+
+        self.objects.extend([None] * (new - old))
+        self.free.extend(range(new - 1, old - 1, -1))
+
+    def allocate(self, game_object, position, rotation, size):
+        if not self.free:
+            self.grow()
+
+        slot = self.free.pop()
+        self.ids[slot] = game_object.id
+        self.positions[slot] = (position[0], position[1], position[2])
+        self.rotations[slot] = rotation
+        self.set_size(slot, size)
+        self.live[slot] = True
+        self.objects[slot] = game_object
+        return slot
+
+    def release(self, slot):
+        self.ids[slot] = -1
+        self.live[slot] = False
+        self.objects[slot] = None
+        self.free.append(slot)
+
+    def position(self, slot):
+        return tuple(self.positions[slot].tolist())
+
+    def set_position(self, slot, value):
+        self.positions[slot] = (value[0], value[1], value[2])
+
+    def set_size(self, slot, size):
+        count = min(len(size), 4)
+        self.sizes[slot, :count] = size[:count]
+        self.sizes[slot, count:] = 0.0
+        self.size_lens[slot] = count
+
+    def live_slots(self):
+        return np.flatnonzero(self.live)
+
+    def state(self):
+        """
+        Copies of the ids, positions, rotations and sizes of every object,
+        in slot order, ready to save or send somewhere.
+        """
+        slots = self.live_slots()
+        return self.ids[slots], self.positions[slots], self.rotations[slots], self.sizes[slots]
+
+    def within(self, lo, hi):
+        """
+        The objects whose position lies inside the box from lo to hi.
+        """
+        inside = self.live & np.all((self.positions >= lo) & (self.positions <= hi), axis=1)
+        objects = self.objects
+        return [objects[slot] for slot in np.flatnonzero(inside).tolist()]
@@ -0,0 +1,196 @@
+import multiprocessing
+import os
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from input_log import EVENT_NAMES, HELD_NAMES, from_mask, to_mask
+
+# What each world reports after every step, one row of float32 per world
+OBSERVATION = ('x', 'y', 'z', 'heading', 'state', 'crouching')
+MOVEMENT_STATES = ('ground', 'jumping', 'falling', 'flying')
+
+# What each world is told to do on a step.  The masks use the same bits as
+# input logs, see input_log.to_mask.
+ACTION = np.dtype([
+    ('events', '<u4'),
+    ('held', '<u4'),
+    ('heading', '<f8'),
+])
+
+
+def action(events=(), held=(), heading=0.0):
+    """
+    One world's action as a tuple that can be assigned into an actions array.
+    """
+    return to_mask(EVENT_NAMES, events), to_mask(HELD_NAMES, held), heading
+
+
+def buffer_layout(count):
+    # observations | actions | done, each starting 8 byte aligned
+    observations_size = count * len(OBSERVATION) * 4
+    actions_offset = observations_size + (-observations_size % 8)
+    done_offset = actions_offset + count * ACTION.itemsize
+    return actions_offset, done_offset, done_offset + count
+
+
+def buffer_views(buffer, count):
+    actions_offset, done_offset, size = buffer_layout(count)
+    observations = np.ndarray((count, len(OBSERVATION)), dtype=np.float32, buffer=buffer)
+    actions = np.ndarray((count,), dtype=ACTION, buffer=buffer, offset=actions_offset)
+    done = np.ndarray((count,), dtype=np.bool_, buffer=buffer, offset=done_offset)
+    return observations, actions, done
+
+
+def observe(game, row):
+    player = game.player
+    x, y, z = player.getPos()
+    row[:] = (x, y, z, player.getH(), MOVEMENT_STATES.index(player.movementState), player.isCrouching)
+
+
+def is_done(game, course):
+    position = game.player.getPos()
+    return course.is_complete(position) or course.has_fallen(position)
+
+
+def worker(connection, buffer_name, count, start, stop, level, step_size, quiet):
+    # Imported here so the parent process never builds a world of its own
+    from headless import HeadlessGame
+    from obstacle_course import ObstacleCourse
+
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+
+    buffer = shared_memory.SharedMemory(name=buffer_name)
+    observations, actions, done = buffer_views(buffer.buf, count)
+
+    games = []
+    courses = []
+    for _ in range(start, stop):
+        game = HeadlessGame(level, step_size)
+        games.append(game)
+        # Loaded levels have no course object, but the same goal and floor
+        courses.append(game.course or ObstacleCourse(game.game_world))
+
+    try:
+        while True:
+            command = connection.recv()
+            if command == 'step':
+                for i, game, course in zip(range(start, stop), games, courses):
+                    events, held, heading = actions[i].tolist()
+                    game.set_heading(heading)
+                    game.step(from_mask(EVENT_NAMES, events), from_mask(HELD_NAMES, held))
+
+                    # Finished worlds start over, the caller sees done once
+                    done[i] = is_done(game, course)
+                    if done[i]:
+                        game.game_world.reset()
+
+                    observe(game, observations[i])
+            elif command == 'reset':
+                for i, game in enumerate(games, start):
+                    game.game_world.reset()
+                    done[i] = False
+                    observe(game, observations[i])
+            elif command == 'close':
+                break
+
+            connection.send(None)
+    finally:
+        del observations, actions, done
+        buffer.close()
+
+
+class VectorEnv:
+    """
+    Runs count independent copies of the obstacle course split across
+    worker processes, one HeadlessGame per world.  Actions go in and
+    observations come back through one block of shared memory, the pipes
+    to the workers only carry the command.
+
+    step() takes an ACTION array with a row per world and returns the
+    observations (columns as in OBSERVATION) and a done flag per world.
+    A world that's done has already been reset for the next step.
+    """
+
+    def __init__(self, count, level=None, workers=None, step_size=1.0 / 60.0, quiet=True):
+        self.count = count
+        workers = min(workers or os.cpu_count(), count)
+
+        self.buffer = shared_memory.SharedMemory(create=True, size=buffer_layout(count)[2])
+        self.observations, self.actions, self.done = buffer_views(self.buffer.buf, count)
+        self.actions[:] = action()
+
+        self.connections = []
+        self.processes = []
+        bounds = np.linspace(0, count, workers + 1).astype(int).tolist()
+        for start, stop in zip(bounds, bounds[1:]):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=worker, daemon=True,
+                                              args=(child, self.buffer.name, count, start, stop, level, step_size,
+                                                    quiet))
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def send(self, command):
+        # Every worker runs its share at the same time, then we wait for all
+        for connection in self.connections:
+            connection.send(command)
+        for connection in self.connections:
+            connection.recv()
+
+    def reset(self):
+        self.send('reset')
+        return self.observations.copy()
+
+    def step(self, actions=None):
+        if actions is not None:
+            self.actions[:] = actions
+
+        self.send('step')
+        return self.observations.copy(), self.done.copy()
+
+    def close(self):
+        if not self.processes:
+            return
+
+        for connection in self.connections:
+            connection.send('close')
+        for process in self.processes:
+            process.join()
+
+        self.connections = []
+        self.processes = []
+
+        del self.observations, self.actions, self.done
+        self.buffer.close()
+        self.buffer.unlink()
+
+
+if __name__ == '__main__':
+    import time
+
+    count = os.cpu_count()
+    with VectorEnv(count) as env:
+        env.reset()
+        actions = np.array([action(held=('moveForward',), heading=-90.0)] * count, dtype=ACTION)
+
+        frames = 600
+        start = time.perf_counter()
+        for _ in range(frames):
+            observations, done = env.step(actions)
+        elapsed = time.perf_counter() - start
+
+        print(f"Stepped {count} worlds {frames} times at {count * frames / elapsed:.0f} world steps per second")
@@ -1,8 +1,11 @@
-import pubsub.pub
-from panda3d.core import CollisionBox, CollisionNode
-from pubsub import pub
+from panda3d.core import CollisionBox, CollisionNode, Vec3
 
 class ViewObject:
+    # Loaded by the first view and copied by the rest
+    cube_model = None
+    cube_texture = None
+    cube_bounds = None
+
     def __init__(self, game_object):
         self.game_object = game_object
 
@@ -13,19 +16,11 @@ class ViewObject:
 
         # TODO: we don't always need a cube model.  Check the
         # game object's kind property to what type of model to use
-        self.cube = base.loader.loadModel("Models/cube")
-        self.cube.reparentTo(self.node_path)
-
-        # TODO: we don't always need a texture.  We need a
-        # mechanism to see if we need a texture or color,
-        # and what texture/color to use.
-        self.cube_texture = base.loader.loadTexture("Textures/crate.png")
-        self.cube.setTexture(self.cube_texture)
+        if ViewObject.cube_model is None:
+            ViewObject.load_cube()
 
-        bounds = self.cube.getTightBounds()
-        # bounds is two vectors
-        bounds = bounds[1]-bounds[0]
-        # bounds is now the widths with bounds[0] the x width, bounds[1] the y depth, bounds[2] the z height
+        self.cube = self.cube_model.copyTo(self.node_path)
+        bounds = self.cube_bounds
         size = game_object.size
 
         x_scale = size[0] / bounds[0]
@@ -36,38 +31,87 @@ class ViewObject:
 
         self.is_selected = False
         self.texture_on = True
-        self.toggle_texture_pressed = False
-        pub.subscribe(self.toggle_texture, 'input')
+
+        # Where the game object was after the last two simulation steps,
+        # the view is drawn in between, see interpolate
+        self.previous = self.current = tuple(game_object.position)
+        self.sync()
+
+    @classmethod
+    def load_cube(cls):
+        cls.cube_model = base.loader.loadModel("Models/cube")
+
+        # TODO: we don't always need a texture.  We need a
+        # mechanism to see if we need a texture or color,
+        # and what texture/color to use.
+        cls.cube_texture = base.loader.loadTexture("Textures/crate.png")
+        cls.cube_model.setTexture(cls.cube_texture)
+
+        bounds = cls.cube_model.getTightBounds()
+        # bounds is two vectors, the difference is the widths with
+        # [0] the x width, [1] the y depth, [2] the z height
+        cls.cube_bounds = bounds[1] - bounds[0]
 
     def deleted(self):
+        # The cube hangs off the physics node, which outlives the view if
+        # the object is only streamed out
         self.cube.removeNode()
+        self.node_path.removeNode()
 
-    def toggle_texture(self, events=None):
-        if 'toggleTexture' in events:
-            self.toggle_texture_pressed = True
+    def parked(self):
+        # Hidden until the game object is revived from the pool
+        self.node_path.stash()
+
+    def revived(self):
+        self.node_path.unstash()
+
+        self.previous = self.current = tuple(self.game_object.position)
+        self.sync()
+
+        if not self.texture_on:
+            self.toggle_texture()
+
+    def toggle_texture(self):
+        if self.texture_on:
+            self.texture_on = False
+            self.cube.setTextureOff(1)
+        else:
+            self.texture_on = True
+            self.cube.setTexture(self.cube_texture)
+
+    def sync(self):
+        # Called when the game object has moved.  The rotation will only
+        # be needed for game objects that aren't also physics objects.
+        # physics objects will have their position and rotation
+        # updated by the engine automatically
+        self.previous = self.current
+        self.current = tuple(self.game_object.position)
 
-    def tick(self):
-        # This will only be needed for game objects that
-        # aren't also physics objects.  physics objects will
-        # have their position and rotation updated by the
-        # engine automatically
         if not self.game_object.physics:
             h = self.game_object.z_rotation
             p = self.game_object.x_rotation
             r = self.game_object.y_rotation
             self.cube.setHpr(h, p, r)
-            self.cube.set_pos(*self.game_object.position)
-
-        # If the right control was pressed, and the game object
-        # is currently selected, toggle the texture.
-        if self.toggle_texture_pressed and self.game_object.is_selected:
-            if self.texture_on:
-                self.texture_on = False
-                self.cube.setTextureOff(1)
-            else:
-                self.texture_on = True
-                self.cube.setTexture(self.cube_texture)
-
-        self.toggle_texture_pressed = False
-        self.game_object.is_selected = False
+
+        self.interpolate(1.0)
+
+    def settle(self):
+        # Stopped moving, stay where the last step put us
+        self.previous = self.current
+        self.interpolate(1.0)
+
+    def interpolate(self, alpha):
+        px, py, pz = self.previous
+        cx, cy, cz = self.current
+        x = px + (cx - px) * alpha
+        y = py + (cy - py) * alpha
+        z = pz + (cz - pz) * alpha
+
+        if self.game_object.physics:
+            # The node is wherever the body is, so move the model back
+            # from there to where it's drawn, in the body's own frame as
+            # it may have turned
+            self.cube.setPos(self.node_path.getRelativeVector(base.render, Vec3(x - cx, y - cy, z - cz)))
+        else:
+            self.cube.setPos(x, y, z)
 
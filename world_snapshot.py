@@ -0,0 +1,62 @@
+import numpy as np
+
+
+class WorldSnapshot:
+    """
+    The state of a game world at one moment, made by GameWorld.snapshot and
+    put back with GameWorld.restore.
+
+    Objects that can move are stored as rows of a few arrays: position and
+    rotation quaternion, linear and angular velocity, and the x/y/z rotation
+    the game object keeps for itself.  Static objects never move, so only
+    their ids are kept.  Characters are stored with their own get_state.
+    """
+
+    def __init__(self, ids, transforms, velocities, rotations, static_ids, characters, properties):
+        self.ids = ids
+        self.transforms = transforms
+        self.velocities = velocities
+        self.rotations = rotations
+        self.static_ids = static_ids
+        self.characters = characters
+        self.properties = properties
+
+    def __len__(self):
+        return len(self.ids) + len(self.static_ids)
+
+    @classmethod
+    def capture(cls, game_world):
+        moving = list(game_world.dynamic_objects.values())
+        count = len(moving)
+
+        ids = np.empty(count, dtype=np.int64)
+        transforms = np.zeros((count, 7))
+        velocities = np.zeros((count, 6))
+        rotations = np.empty((count, 3))
+
+        for row, game_object in enumerate(moving):
+            ids[row] = game_object.id
+            rotations[row] = (game_object.x_rotation, game_object.y_rotation, game_object.z_rotation)
+
+            physics = game_object.physics
+            if is_simulated(physics):
+                transform = physics.getTransform()
+                transforms[row, :3] = tuple(transform.getPos())
+                transforms[row, 3:] = tuple(transform.getQuat())
+                velocities[row, :3] = tuple(physics.getLinearVelocity())
+                velocities[row, 3:] = tuple(physics.getAngularVelocity())
+            else:
+                transforms[row, :3] = tuple(game_object.position)
+                transforms[row, 3] = 1.0
+
+        static_ids = np.fromiter((id for id in game_world.game_objects if id not in game_world.dynamic_objects),
+                                 dtype=np.int64)
+
+        characters = {id: character.get_state() for id, character in game_world.characters.items()}
+
+        return cls(ids, transforms, velocities, rotations, static_ids, characters, dict(game_world.properties))
+
+
+def is_simulated(physics):
+    # Bodies Bullet moves by itself, as opposed to kinematic ones we move
+    return physics is not None and physics.getMass() > 0 and not physics.isKinematic()
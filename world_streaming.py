@@ -0,0 +1,122 @@
+import math
+
+
+class ChunkStreamer:
+    """
+    Splits a GameWorld's static objects into square chunks on the x/y plane
+    and only keeps the chunks near a focus point (usually the player) live.
+
+    A chunk is activated when it comes within radius of the focus and is
+    deactivated once it is more than radius + hysteresis away, so walking
+    back and forth over a chunk border doesn't thrash.  Objects covering
+    several chunks stay live while any of their chunks is active, and objects
+    covering more than max_chunks_per_object chunks are always live.
+
+    Only static objects are streamed.  Anything that moves stays live, since
+    it could wander out of the chunk it was created in.
+    """
+
+    def __init__(self, game_world, chunk_size=32.0, radius=64.0, hysteresis=16.0, max_chunks_per_object=16):
+        self.game_world = game_world
+        self.chunk_size = chunk_size
+        self.radius = radius
+        self.hysteresis = hysteresis
+        self.max_chunks_per_object = max_chunks_per_object
+
+        self.chunks = {}
+        self.object_chunks = {}
+        self.active_chunks = set()
+
+        # Number of active chunks each streamed object is in
+        self.active_counts = {}
+
+    def chunk_range(self, game_object):
+        lo, hi = game_object.get_bounds()
+        size = self.chunk_size
+        return (math.floor(lo[0] / size), math.floor(lo[1] / size),
+                math.floor(hi[0] / size), math.floor(hi[1] / size))
+
+    def chunk_distance(self, key, focus):
+        # Distance from the focus to the nearest point of the chunk
+        size = self.chunk_size
+        i, j = key
+        dx = max(i * size - focus[0], 0.0, focus[0] - (i + 1) * size)
+        dy = max(j * size - focus[1], 0.0, focus[1] - (j + 1) * size)
+        return math.sqrt(dx * dx + dy * dy)
+
+    def add(self, game_object):
+        """
+        Start streaming an object.  Returns True if it should be live right now.
+        """
+        if not game_object.is_static:
+            return True
+
+        i0, j0, i1, j1 = self.chunk_range(game_object)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > self.max_chunks_per_object:
+            return True
+
+        keys = [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+        self.object_chunks[game_object.id] = keys
+
+        count = 0
+        for key in keys:
+            self.chunks.setdefault(key, {})[game_object.id] = game_object
+            if key in self.active_chunks:
+                count += 1
+
+        self.active_counts[game_object.id] = count
+        return count > 0
+
+    def remove(self, game_object):
+        keys = self.object_chunks.pop(game_object.id, None)
+        if keys is None:
+            return
+
+        for key in keys:
+            chunk = self.chunks[key]
+            del chunk[game_object.id]
+            if not chunk:
+                del self.chunks[key]
+                self.active_chunks.discard(key)
+
+        del self.active_counts[game_object.id]
+
+    def is_active(self, game_object):
+        count = self.active_counts.get(game_object.id)
+        return count is None or count > 0
+
+    def update(self, focus):
+        radius = self.radius
+        size = self.chunk_size
+
+        i0 = math.floor((focus[0] - radius) / size)
+        i1 = math.floor((focus[0] + radius) / size)
+        j0 = math.floor((focus[1] - radius) / size)
+        j1 = math.floor((focus[1] + radius) / size)
+
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                key = (i, j)
+                if key in self.chunks and key not in self.active_chunks and \
+                        self.chunk_distance(key, focus) <= radius:
+                    self.activate_chunk(key)
+
+        limit = radius + self.hysteresis
+        for key in [key for key in self.active_chunks if self.chunk_distance(key, focus) > limit]:
+            self.deactivate_chunk(key)
+
+    def activate_chunk(self, key):
+        self.active_chunks.add(key)
+
+        for id, game_object in self.chunks[key].items():
+            self.active_counts[id] += 1
+            if self.active_counts[id] == 1:
+                self.game_world.activate_object(game_object)
+
+    def deactivate_chunk(self, key):
+        self.active_chunks.discard(key)
+
+        for id, game_object in self.chunks[key].items():
+            self.active_counts[id] -= 1
+            if self.active_counts[id] == 0:
+                self.game_world.deactivate_object(game_object)
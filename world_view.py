@@ -1,4 +1,3 @@
-from pubsub import pub
 from view_object import ViewObject
 
 class WorldView:
@@ -6,21 +5,113 @@ class WorldView:
         self.game_logic = game_logic
         self.view_objects = {}
 
-        pub.subscribe(self.new_game_object, 'create')
-        pub.subscribe(self.destroy_game_object, 'destroy')
+        # Views of objects parked in the world's pool, kept for when they're revived
+        self.parked_views = {}
+
+        self.toggle_texture_pressed = False
+
+        # Views drawn between two simulation steps, see interpolate
+        self.moving = {}
+
+        game_logic.create_topic.subscribe(self.new_game_objects)
+        game_logic.destroy_topic.subscribe(self.destroy_game_objects)
+
+        # Objects streamed in and out of the world only have a view while live
+        game_logic.activate_topic.subscribe(self.new_game_objects)
+        game_logic.deactivate_topic.subscribe(self.deactivate_game_objects)
+
+        game_logic.purge_topic.subscribe(self.purge_game_objects)
+        game_logic.input_topic.subscribe(self.input_event)
+
+    def new_game_objects(self, game_objects):
+        for game_object in game_objects:
+            self.new_game_object(game_object)
 
     def new_game_object(self, game_object):
         if game_object.kind == 'player':
             return
 
-        view_object = ViewObject(game_object)
+        if not self.game_logic.is_active(game_object):
+            return
+
+        if game_object.id in self.parked_views:
+            view_object = self.parked_views.pop(game_object.id)
+            view_object.revived()
+        else:
+            view_object = ViewObject(game_object)
+
         self.view_objects[game_object.id] = view_object
 
+    def destroy_game_objects(self, game_objects):
+        for game_object in game_objects:
+            self.destroy_game_object(game_object)
+
     def destroy_game_object(self, game_object):
         if game_object.id in self.view_objects:
-            self.view_objects[game_object.id].deleted()
-            del self.view_objects[game_object.id]
+            view_object = self.view_objects.pop(game_object.id)
+            self.moving.pop(game_object.id, None)
+
+            # An object taken back out of the pool before a batched event
+            # arrives gets a new view from the create event that follows
+            if self.game_logic.pool.is_parked(game_object):
+                view_object.parked()
+                self.parked_views[game_object.id] = view_object
+            else:
+                view_object.deleted()
+
+    def deactivate_game_objects(self, game_objects):
+        # Streamed out objects may not come back for a long time, if ever,
+        # so their views are let go rather than parked
+        for game_object in game_objects:
+            if game_object.id in self.view_objects:
+                self.view_objects.pop(game_object.id).deleted()
+                self.moving.pop(game_object.id, None)
+
+    def purge_game_objects(self, game_objects):
+        for game_object in game_objects:
+            if game_object.id in self.parked_views:
+                self.parked_views.pop(game_object.id).deleted()
+
+    def input_event(self, events):
+        if 'toggleTexture' in events:
+            self.toggle_texture_pressed = True
 
     def tick(self):
-        for key in self.view_objects:
-            self.view_objects[key].tick()
+        view_objects = self.view_objects
+        selected = self.game_logic.selected
+
+        # If the right control was pressed, toggle the texture of
+        # whichever object is currently selected
+        if self.toggle_texture_pressed:
+            for id in selected:
+                if id in view_objects:
+                    view_objects[id].toggle_texture()
+
+        self.toggle_texture_pressed = False
+
+        for game_object in selected.values():
+            game_object.is_selected = False
+        selected.clear()
+
+        # Views that moved the step before but not this one have stopped
+        last_moved = self.game_logic.last_moved
+        moving = self.moving
+        for id in [id for id in moving if id not in last_moved]:
+            moving.pop(id).settle()
+
+        # Only views of objects that moved in the last world tick need
+        # updating, an idle scene costs next to nothing
+        for id in last_moved:
+            if id in view_objects:
+                view_object = view_objects[id]
+                view_object.sync()
+                moving[id] = view_object
+
+    def interpolate(self, alpha):
+        """
+        Draw everything that's moving alpha of the way from where it was
+        after the second last simulation step to where it is now.  Call
+        once a frame after the world has been stepped.
+        """
+        for view_object in self.moving.values():
+            view_object.interpolate(alpha)